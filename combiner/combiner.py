@@ -3,7 +3,6 @@ from pathlib import Path
 
 import ipal_iids.settings as settings
 from ipal_iids.utils import relative_to_config
-import joblib
 
 
 class Combiner(ABC):
@@ -46,7 +45,14 @@ class Combiner(ABC):
     def combine(self, msg):
         pass
 
+    # during the live phase, messages may be handed to the combiner in batches. Returns a list with an (alert, metric)
+    # tuple for each message. Combiners may override this function to combine all messages at once
+    def combine_msgs(self, msgs):
+        return [self.combine(msg) for msg in msgs]
+
     def save_trained_model(self):
+        import joblib
+
         if self.settings["model-file"] is None:
             return False
 
@@ -57,6 +63,8 @@ class Combiner(ABC):
         return True
 
     def load_trained_model(self):
+        import joblib
+
         if self.settings["model-file"] is None:
             return False
 
@@ -1,9 +1,13 @@
 import csv
+import numpy as np
 from combiner.combiner import Combiner
 from ipal_iids.utils import open_file
 import ipal_iids.settings as settings
 import itertools
 
+# Bit of an IDS alert in the index of an input word. Raises a KeyError for non-binary alerts
+_BITS = {False: 0, True: 1}
+
 
 class HeuristicCombiner(Combiner):
     """
@@ -36,24 +40,33 @@ class HeuristicCombiner(Combiner):
         # Sequentialized into a list.
         return list(itertools.product([0, 1], repeat=len(self._ids_order)))
 
+    def _get_input_index(self, msg):
+        # Position of the IDS alerts in the input order, i.e., the alerts read as a
+        # binary number with the first IDS as the most significant bit
+        index = 0
+        for ids_name in self._ids_order:
+            index = 2 * index + _BITS[msg["alerts"][ids_name]]
+        return index
+
     def train(self, msgs):
         # Save the order of the IDSs
         self._ids_order = list(msgs[0]["alerts"].keys())
 
-        # All possible IDS outputs (which are inputs to the combiner)
-        inputs = self._get_input_order()
-
         # For each tuple of IDS inputs, we count how many times it is benign and how many times it is malicious.
-        # First index: benign, second index: malicious
-        input_stats = {input: [0, 0] for input in inputs}
-
         settings.logger.info("Computing statistics over train set...")
 
-        for msg in msgs:
-            alerts = tuple(msg["alerts"][ids_name] for ids_name in self._ids_order)
-            malicious = msg["malicious"] is not False
+        index = np.fromiter(
+            (self._get_input_index(msg) for msg in msgs),
+            dtype=np.int64,
+            count=len(msgs),
+        )
+        malicious = np.fromiter(
+            (msg["malicious"] is not False for msg in msgs), dtype=bool, count=len(msgs)
+        )
 
-            input_stats[alerts][int(malicious)] += 1
+        size = 2 ** len(self._ids_order)
+        benign_counts = np.bincount(index[~malicious], minlength=size)
+        malicious_counts = np.bincount(index[malicious], minlength=size)
 
         if self.settings["stats-file"] is not None:
             settings.logger.info("Dumping computed message statistics to file.")
@@ -61,16 +74,21 @@ class HeuristicCombiner(Combiner):
                 writer = csv.writer(f)
                 writer.writerow([*self._ids_order, "benign", "malicious"])
                 writer.writerows(
-                    [[*input, *stats] for input, stats in input_stats.items()]
+                    [
+                        [*input, benign, malicious]
+                        for input, benign, malicious in zip(
+                            self._get_input_order(),
+                            benign_counts.tolist(),
+                            malicious_counts.tolist(),
+                        )
+                    ]
                 )
 
         settings.logger.info("Computing heuristic combiner...")
 
         # Assign an output to each input based on if there are more malicious or benign packets with that input
         outputs = []
-        for input in inputs:
-            benign, malicious = input_stats[input]
-
+        for benign, malicious in zip(benign_counts.tolist(), malicious_counts.tolist()):
             if benign == malicious:
                 outputs.append(self.settings["tie_breaker"])
             else:
@@ -81,12 +99,7 @@ class HeuristicCombiner(Combiner):
         settings.logger.info("Combiner training done")
 
     def combine(self, msg):
-        inputs = tuple(msg["alerts"][ids_name] for ids_name in self._ids_order)
-
-        input_order = self._get_input_order()
-        input_index = input_order.index(inputs)
-
-        alert = self._combiner_fct[input_index]
+        alert = self._combiner_fct[self._get_input_index(msg)]
 
         return alert, 1 if alert else 0
 
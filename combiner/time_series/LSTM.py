@@ -1,3 +1,5 @@
+import numpy as np
+
 from combiner.combiner import Combiner
 
 from tensorflow.keras.models import Sequential  # noqa: E402
@@ -29,7 +31,9 @@ class LSTMCombiner(Combiner):
         self._lstm = None
         self._ids_order = None
 
-        self._buffer = []
+        self._buffer = None  # Ring buffer of activations, see _push
+        self._pos = 0
+        self._count = 0
 
     def _lstm_model(self, input_dim):
         model = Sequential()
@@ -53,13 +57,17 @@ class LSTMCombiner(Combiner):
         return (self.settings["lookback"] - 1) * self.settings["stride"] + 1
 
     def _get_sequences(self, events, annotations):
-        Xseq, Yseq = [], []
-
         window_size = self._get_window_size()
 
-        for i in range(len(events) - window_size + 1):
-            Xseq.append(events[i : i + window_size : self.settings["stride"]])
-            Yseq.append(annotations[i + window_size - 1])
+        # Strided view on all windows of shape (#windows, lookback, #IDSs)
+        events = np.asarray(events, dtype="float32")
+        if len(events) < window_size:
+            shape = (0, self.settings["lookback"], len(self._ids_order))
+            return np.zeros(shape, "float32"), annotations[:0]
+
+        windows = np.lib.stride_tricks.sliding_window_view(events, window_size, axis=0)
+        Xseq = windows[:, :, :: self.settings["stride"]].transpose(0, 2, 1)
+        Yseq = annotations[window_size - 1 :]
 
         return Xseq, Yseq
 
@@ -74,29 +82,65 @@ class LSTMCombiner(Combiner):
             events.append(self._get_activations(msg))
             annotations.append(msg["malicious"] is not False)
 
-        X, Y = self._get_sequences(events, annotations)
+        X, Y = self._get_sequences(events, np.array(annotations))
 
         settings.logger.info(
             f"Training LSTM combiner for {self.settings['epochs']} epochs..."
         )
         self._lstm.fit(X, Y, epochs=self.settings["epochs"], verbose=10)
 
-    def combine(self, msg):
-        self._buffer.append(self._get_activations(msg))
-
+    def _push(self, msg):
+        # Adds the activations to the ring buffer and returns the current sequence
+        # once the window is complete. Each row is stored twice, such that the window
+        # is always a contiguous block of the buffer
         window_size = self._get_window_size()
-        if len(self._buffer) > window_size:
-            self._buffer.pop(0)
-        elif len(self._buffer) < window_size:
-            return False, 0
+        if self._buffer is None:
+            self._buffer = np.zeros((2 * window_size, len(self._ids_order)), "float32")
+
+        activations = self._get_activations(msg)
+        self._buffer[self._pos] = activations
+        self._buffer[self._pos + window_size] = activations
+        self._pos = (self._pos + 1) % window_size
+        self._count += 1
+
+        if self._count < window_size:
+            return None
+        return self._buffer[
+            self._pos : self._pos + window_size : self.settings["stride"]
+        ]
 
-        sequence = self._buffer[:: self.settings["stride"]]
+    def _predict(self, sequences):
+        # Call the model directly, which avoids the overhead of model.predict
+        predictions = self._lstm(np.stack(sequences), training=False).numpy()
+        return [float(p[0]) for p in predictions]
 
-        prediction = float(self._lstm.predict([sequence], verbose=False)[0][0])
+    def combine(self, msg):
+        sequence = self._push(msg)
+        if sequence is None:
+            return False, 0
+
+        prediction = self._predict([sequence])[0]
         alert = bool(prediction > 0.5)
 
         return alert, prediction
 
+    def combine_msgs(self, msgs):
+        # Combine all complete windows of the batch with a single model call
+        results = [(False, 0)] * len(msgs)
+        index, sequences = [], []
+
+        for i, msg in enumerate(msgs):
+            sequence = self._push(msg)
+            if sequence is not None:
+                index.append(i)
+                sequences.append(sequence.copy())
+
+        if len(sequences) > 0:
+            for i, prediction in zip(index, self._predict(sequences)):
+                results[i] = bool(prediction > 0.5), prediction
+
+        return results
+
     def save_trained_model(self):
         if not super().save_trained_model():
             return False
@@ -122,4 +166,3 @@ class LSTMCombiner(Combiner):
 
     def _load_model(self, model):
         self._ids_order = model["ids_order"]
-
@@ -1,33 +1,32 @@
-from .time_series.LSTM import LSTMCombiner
-from .time_series.RunningAverageSVM import RunningAverageSVMCombiner
-from .ml.SVMCombiner import SVMCombiner
-from .other.GurobiCombiner import GurobiCombiner
-from .linear.MetricVote import MetricVote
-from .linear.And import AndCombiner
-from .oracle.OptimalCombiner import OptimalCombiner
-from .other.HeuristicCombiner import HeuristicCombiner
-from .linear.WeightedVote import WeightedVote
-from .linear.Or import OrCombiner
-from .linear.MajorityVote import MajorityVote
-from .linear.LogisticRegression import LogisticRegression
+import importlib
 
+# Combiners are imported lazily, i.e., only if a config references them. Some of
+# them depend on heavy libraries (e.g., tensorflow or gurobipy) which would
+# otherwise slow down the startup of ipal-iids considerably.
+combiners = {
+    "MajorityVote": "combiner.linear.MajorityVote.MajorityVote",
+    "Or": "combiner.linear.Or.OrCombiner",
+    "And": "combiner.linear.And.AndCombiner",
+    "WeightedVote": "combiner.linear.WeightedVote.WeightedVote",
+    "MetricVote": "combiner.linear.MetricVote.MetricVote",
+    "HeuristicCombiner": "combiner.other.HeuristicCombiner.HeuristicCombiner",
+    "OptimalCombiner": "combiner.oracle.OptimalCombiner.OptimalCombiner",
+    "GurobiCombiner": "combiner.other.GurobiCombiner.GurobiCombiner",
+    "SVMCombiner": "combiner.ml.SVMCombiner.SVMCombiner",
+    "LogisticRegression": "combiner.linear.LogisticRegression.LogisticRegression",
+    "LSTMCombiner": "combiner.time_series.LSTM.LSTMCombiner",
+    "RunningAverageSVM": "combiner.time_series.RunningAverageSVM.RunningAverageSVMCombiner",
+}
 
-combiners = [
-    MajorityVote,
-    OrCombiner,
-    AndCombiner,
-    WeightedVote,
-    MetricVote,
-    HeuristicCombiner,
-    OptimalCombiner,
-    GurobiCombiner,
-    SVMCombiner,
-    LogisticRegression,
-    LSTMCombiner,
-    RunningAverageSVMCombiner,
-]
 
+def get_combiner_names():
+    return list(combiners.keys())
 
-def get_all_combiners():
-    return {combiner._name: combiner for combiner in combiners}
 
+def get_combiner(name):
+    module, cls = combiners[name].rsplit(".", 1)
+    return getattr(importlib.import_module(module), cls)
+
+
+def get_all_combiners():
+    return {name: get_combiner(name) for name in combiners}
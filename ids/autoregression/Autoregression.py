@@ -1,19 +1,45 @@
-import json
+import numpy as np
 
 from ar import arsel
+from array import array
 
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
 
 from ids.ids import MetaIDS
 
 
+class LagWindow:
+    """
+    The last n values of a sensor in a ring buffer. Each value is stored twice, such
+    that the window is always available as a contiguous array from oldest to newest.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.buffer = np.zeros(2 * n)
+        self.pos = 0
+        self.count = 0
+
+    def push(self, value):
+        self.buffer[self.pos] = value
+        self.buffer[self.pos + self.n] = value
+        self.pos = (self.pos + 1) % self.n
+        self.count += 1
+
+        return self.count >= self.n
+
+    def values(self):
+        return self.buffer[self.pos : self.pos + self.n]
+
+
 class Autoregression(MetaIDS):
 
     _name = "Autoregression"
     _description = "Autoregression and CUSUM"
     _requires = ["train.state", "live.state"]
     _ar_default_settings = {
-        "sensor": None,
+        "sensor": None,  # Name of the sensor or a list of sensor names
         "firstN": None,
         "subtractMean": False,
         "absrho": True,
@@ -28,107 +54,126 @@ class Autoregression(MetaIDS):
         super().__init__(name=name)
         self._add_default_settings(self._ar_default_settings)
 
-        self.model = None
-        self.delta = None
-        self.previous = []
-        self.cusum = 0
-
-    def _calc_residual(self, values, coefficients):
-        return sum([val * coeff for val, coeff in zip(values, coefficients[::-1])])
+        if isinstance(self.settings["sensor"], list):
+            self._sensors = self.settings["sensor"]
+        else:
+            self._sensors = [self.settings["sensor"]]
+
+        # Model, threshold and live state per sensor
+        self.model = {}
+        self.delta = {}
+        self.previous = {}
+        self.cusum = {}
+        self._coefficients = {}
+
+        # Training data handed to the IDS message by message as arrays of doubles
+        self._training_data = None
+
+    def _calc_residuals(self, values, coefficients):
+        # Residuals of all complete windows at once, i.e., the (valid) convolution
+        if len(values) < len(coefficients):
+            return np.zeros(0)
+        return np.convolve(values, coefficients, mode="valid")
+
+    def _reset(self):
+        for sensor in self.model:
+            self.previous[sensor] = LagWindow(len(self.model[sensor].AR[0]))
+            self.cusum[sensor] = 0
+
+    def training_input(self, ipal=None, state=None):
+        return "train.state" if state is not None else None
+
+    def new_train_msg(self, msg):
+        if self._training_data is None:
+            self._training_data = {sensor: array("d") for sensor in self._sensors}
+
+        for sensor in self._sensors:
+            if sensor in msg["state"]:
+                self._training_data[sensor].append(msg["state"][sensor])
+            else:
+                settings.logger.info("Sensor {} not in current state.".format(sensor))
 
     def train(self, ipal=None, state=None):
-        training_data = []
-
-        # Load training data for each sensor
-        with self._open_file(state) as f:
-
-            for line in f.readlines():
-                cur_state = json.loads(line)
+        # Load training data for the sensors unless it was handed to the IDS already
+        if self._training_data is None:
+            with self._open_file(state) as f:
+                for line in f:
+                    self.new_train_msg(codec.loads(line))
+
+        training_data = self._training_data or {}
+        self._training_data = None
+
+        for sensor in self._sensors:
+            self._train_sensor(
+                sensor, np.frombuffer(training_data.get(sensor, array("d")))
+            )
 
-                if self.settings["sensor"] in cur_state["state"]:
-                    training_data.append(cur_state["state"][self.settings["sensor"]])
-                else:
-                    settings.logger.info(
-                        "Sensor {} not in current state.".format(
-                            self.settings["sensor"]
-                        )
-                    )
+        # Reset values
+        self._reset()
 
-        if self.settings["firstN"] is None:
+    def _train_sensor(self, sensor, training_data):
+        firstN = self.settings["firstN"]
+        if firstN is None:
             settings.logger.info("Setting firstN for default 80%")
-            self.settings["firstN"] = int(len(training_data) * 0.8)
+            firstN = int(len(training_data) * 0.8)
+            if len(self._sensors) == 1:
+                self.settings["firstN"] = firstN
 
         # Train autoregression model
         # For example, given a sequence or *row-vector* of samples 'd', one can fit a process, obtain its poles, and simulate a realization of length M using
         # Usage: M = arsel (data, submean, absrho, criterion, minorder, maxorder)
-        self.model = arsel(
-            training_data[: self.settings["firstN"]],
+        model = arsel(
+            training_data[:firstN],
             self.settings["subtractMean"],
             self.settings["absrho"],
             self.settings["criterion"],
             self.settings["minorder"],
             self.settings["maxorder"],
         )
+        self.model[sensor] = model
+        self._coefficients[sensor] = np.ascontiguousarray(model.AR[0][::-1], float)
 
         settings.logger.info(
-            "Autoregression model for sensor {} is {}".format(
-                self.settings["sensor"], self.model
-            )
+            "Autoregression model for sensor {} is {}".format(sensor, model)
         )
 
         # Find threshold delta
+        values = training_data[firstN:]
+        if model.submean:
+            values = values - model.mu[0]
 
-        self.delta = 0
+        rk = self._calc_residuals(values, np.asarray(model.AR[0], float))
 
-        for v in training_data[self.settings["firstN"] :]:
-
-            self.previous.append(v)
-            if self.model.submean:
-                self.previous[-1] -= self.model.mu[0]
-
-            if len(self.previous) < len(self.model.AR[0]):
-                continue
-            elif len(self.previous) > len(self.model.AR[0]):
-                self.previous.pop(0)
-
-            assert len(self.previous) == len(self.model.AR[0])
-
-            rk = self._calc_residual(self.previous, self.model.AR[0])
-
-            # self.delta = max(self.delta, abs(rk))
-            self.delta += abs(rk)
-
-        self.delta /= len(training_data) - self.settings["firstN"]
+        # self.delta = max(self.delta, abs(rk))
+        self.delta[sensor] = np.sum(np.abs(rk)) / (len(training_data) - firstN)
         settings.logger.info(
-            "Delta for sensor '{}' is {}".format(self.settings["sensor"], self.delta)
+            "Delta for sensor '{}' is {}".format(sensor, self.delta[sensor])
         )
 
-        # Reset values
-        self.previous = []
-        self.cusum = 0
-
     def new_state_msg(self, msg):
+        alert, metric = False, 0
 
-        if self.settings["sensor"] not in msg["state"]:  # Sensor not available
-            return False, 0
-        value = msg["state"][self.settings["sensor"]]
+        for sensor in self._sensors:
+            if sensor not in msg["state"]:  # Sensor not available
+                continue
+            value = msg["state"][sensor]
 
-        if self.model.submean:
-            value -= self.model.mu[0]
-        self.previous.append(value)
+            if self.model[sensor].submean:
+                value -= self.model[sensor].mu[0]
 
-        if len(self.previous) < len(self.model.AR[0]):
-            return False, 0
-        elif len(self.previous) > len(self.model.AR[0]):
-            self.previous.pop(0)  # Remove oldest item
+            if not self.previous[sensor].push(value):
+                continue
 
-        assert len(self.previous) == len(self.model.AR[0])
+            rk = np.dot(self.previous[sensor].values(), self._coefficients[sensor])
+            self.cusum[sensor] = max(
+                0, self.cusum[sensor] + abs(rk) - self.delta[sensor]
+            )
 
-        rk = self._calc_residual(self.previous, self.model.AR[0])
-        self.cusum = max(0, self.cusum + abs(rk) - self.delta)
+            if self.settings["eval"]:
+                settings.logger.info("{},{}".format(abs(rk), self.cusum[sensor]))
 
-        if self.settings["eval"]:
-            settings.logger.info("{},{}".format(abs(rk), self.cusum))
+            # TODO decide on anomaly
+            alert = None
+            metric = max(metric, self.cusum[sensor])  # Largest CUSUM of all sensors
 
-        # TODO decide on anomaly
-        return None, self.cusum
+        return alert, metric
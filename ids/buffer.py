@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class RowBuffer:
+    """
+    Growable two-dimensional array that collects rows of equal length chunk by
+    chunk. Rows are stored as float64 as long as all values are floats. Otherwise,
+    e.g., for strings or None, the buffer falls back to an object array keeping
+    the original Python objects.
+    """
+
+    def __init__(self, width, chunksize=None):
+        self.width = width
+        # Default to chunks of about 8 MB for float rows
+        self.chunksize = chunksize or max(1024, 2**20 // max(width, 1))
+        self.dtype = np.float64
+
+        self._chunks = []
+        self._rows = 0  # Rows used in the last chunk
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, row):
+        if self.dtype is np.float64 and not all(type(v) is float for v in row):
+            self._to_object()
+
+        if len(self._chunks) == 0 or self._rows == self.chunksize:
+            self._chunks.append(np.empty((self.chunksize, self.width), self.dtype))
+            self._rows = 0
+
+        if self.dtype is np.float64:
+            self._chunks[-1][self._rows] = row
+        else:  # Assign one by one so that nested values are not broadcast
+            chunk = self._chunks[-1]
+            for i, v in enumerate(row):
+                chunk[self._rows, i] = v
+        self._rows += 1
+        self._len += 1
+
+    def _to_object(self):
+        self.dtype = object
+        self._chunks = [chunk.astype(object) for chunk in self._chunks]
+
+    def to_array(self):
+        # Copy chunk by chunk to bound the peak memory to the final array plus one chunk
+        array = np.empty((self._len, self.width), self.dtype)
+
+        offset = 0
+        while len(self._chunks) > 0:
+            chunk = self._chunks.pop(0)
+            rows = min(self.chunksize, self._len - offset)
+            array[offset : offset + rows] = chunk[:rows]
+            offset += rows
+
+        self._rows = 0
+        self._len = 0
+
+        return array
@@ -1,6 +1,7 @@
 import json
 import itertools
 import numpy as np
+import time
 
 # Silence tensorflow
 import os
@@ -26,6 +27,7 @@ class BLSTM(FeatureIDS):
 
     _name = "BLSTM"
     _description = "Bidirectional LSTM."
+    _single_training_input = True
     _blstm_default_settings = {
         # BLSTM GridSearch Parameters
         # TODO Better sample random values?
@@ -48,6 +50,12 @@ class BLSTM(FeatureIDS):
         self.parameters = None
         self.buffer = []
 
+        # Inference latency statistics
+        self._calls = 0
+        self._sequences = 0
+        self._latency = 0.0
+        self._max_latency = 0.0
+
     def make_sequences(self, Xs, Ys, seqlen, step=1):
         Xseq, Yseq = [], []
         for i in range(0, Xs.shape[0] - seqlen + 1, step):
@@ -168,23 +176,49 @@ class BLSTM(FeatureIDS):
                 )
             )
 
-    def new_state_msg(self, msg):
-        state = super().new_state_msg(msg)
-        if state is None:
-            return False, None
+    def _predict(self, sequences):
+        # Call the model directly, which avoids the overhead of model.predict
+        predictions = []
+        for i in range(0, len(sequences), self.parameters["batch_size"]):
+            X = np.asarray(
+                sequences[i : i + self.parameters["batch_size"]], dtype="float32"
+            )
+
+            start = time.perf_counter()
+            predictions.extend(self.blstm(X, training=False).numpy().astype("float32"))
+            latency = time.perf_counter() - start
+
+            self._calls += 1
+            self._sequences += len(X)
+            self._latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if self._calls % 1000 == 0:
+                self._log_latency()
 
+        return predictions
+
+    def _log_latency(self):
+        settings.logger.info(
+            "BLSTM inference: {} calls with {} sequences, {:.3f}ms mean and {:.3f}ms max latency per call".format(
+                self._calls,
+                self._sequences,
+                1000 * self._latency / max(self._calls, 1),
+                1000 * self._max_latency,
+            )
+        )
+
+    def _add_state(self, state):
+        # Returns the sequence once it is complete
         self.buffer.append(state)
         if len(self.buffer) != self.parameters["sequence_length"]:
-            return False, 0
-
-        predict = self.blstm.predict(
-            [self.buffer],
-            batch_size=self.parameters["batch_size"],
-            verbose=self.settings["verbose"],
-        ).astype("float32")
+            return None
 
+        sequence = self.buffer
         self.buffer = []
-        predict = [float(x[0]) for x in predict[0]]
+        return sequence
+
+    def _evaluate(self, msg, predict):
+        predict = [float(x[0]) for x in predict]
         alerts = [bool(x > 0.5) for x in predict]
 
         if "adjust" in self.settings:  # Annotate offset for adjust script
@@ -197,10 +231,48 @@ class BLSTM(FeatureIDS):
 
         return any(alerts), max(predict)
 
+    def new_state_msg(self, msg):
+        state = super().new_state_msg(msg)
+        if state is None:
+            return False, None
+
+        sequence = self._add_state(state)
+        if sequence is None:
+            return False, 0
+
+        return self._evaluate(msg, self._predict([sequence])[0])
+
+    def new_state_msgs(self, msgs):
+        # Classify all sequences completed within the batch with a single model call
+        results = [None] * len(msgs)
+        pending = []
+
+        for i, msg in enumerate(msgs):
+            state = super().new_state_msg(msg)
+            if state is None:
+                results[i] = (False, None)
+                continue
+
+            sequence = self._add_state(state)
+            if sequence is None:
+                results[i] = (False, 0)
+            else:
+                pending.append((i, sequence))
+
+        if len(pending) > 0:
+            predictions = self._predict([sequence for _, sequence in pending])
+            for (i, _), predict in zip(pending, predictions):
+                results[i] = self._evaluate(msgs[i], predict)
+
+        return results
+
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
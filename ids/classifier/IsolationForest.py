@@ -10,6 +10,7 @@ class IsolationForest(FeatureIDS):
 
     _name = "IsolationForest"
     _description = "Isolation forest classifier."
+    _single_training_input = True
     _isolationforest_default_settings = {
         # IsolationForest Parameters
         "n_estimators": 100,
@@ -52,19 +53,28 @@ class IsolationForest(FeatureIDS):
         )
         self.ifc.fit(events)
 
+    def _classify(self, X):
+        # Returns -1 for outliers and 1 for inliers.
+        alerts = self.ifc.predict(X) == -1
+        return [(bool(alert), 1 if alert else 0) for alert in alerts]
+
     def new_state_msg(self, msg):
         state = super().new_state_msg(msg)
         if state is None:
             return False, None
 
-        # Returns -1 for outliers and 1 for inliers.
-        alert = bool(self.ifc.predict([state])[0] == -1)
-        return alert, 1 if alert else 0
+        return self._classify([state])[0]
 
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_state_msgs(self, msgs):
+        return self._classify_msgs(msgs, self._classify, (False, None))
+
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
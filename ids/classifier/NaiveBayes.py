@@ -16,6 +16,7 @@ class NaiveBayes(FeatureIDS):
 
     _name = "NaiveBayes"
     _description = "Naive bayes classifier."
+    _single_training_input = True
     _naivebayes_default_settings = {
         # Wether to calculate the probability as metric in the live phase (takes more time!)
         "calculate_metric": False,
@@ -65,23 +66,33 @@ class NaiveBayes(FeatureIDS):
         self.nbc.fit(events, annotation)
         self.classes = list(self.nbc.classes_)
 
+    def _classify(self, X):
+        if self.settings["calculate_metric"]:
+            probabilities = self.nbc.predict_proba(X)[:, self.classes.index(True)]
+            return [
+                (bool(probability > 0.5), probability) for probability in probabilities
+            ]
+        else:
+            alerts = self.nbc.predict(X)
+            return [(bool(alert), 1 if alert else 0) for alert in alerts]
+
     def new_state_msg(self, msg):
         state = super().new_state_msg(msg)
         if state is None:
             return False, False
 
-        if self.settings["calculate_metric"]:
-            probability = self.nbc.predict_proba([state])[0][self.classes.index(True)]
-            alert = bool(probability > 0.5)
-            return alert, probability
-        else:
-            alert = bool(self.nbc.predict([state])[0])
-            return alert, 1 if alert else 0
+        return self._classify([state])[0]
 
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_state_msgs(self, msgs):
+        return self._classify_msgs(msgs, self._classify, (False, False))
+
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
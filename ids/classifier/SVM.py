@@ -11,6 +11,7 @@ class SVM(FeatureIDS):
 
     _name = "SVM"
     _description = "SVM classifier."
+    _single_training_input = True
     _svm_default_settings = {
         # Wether to calculate the probability as metric in the live phase (takes more time!)
         "calculate_metric": False,
@@ -96,23 +97,31 @@ class SVM(FeatureIDS):
         self.svm = svc.best_estimator_
         self.classes = list(self.svm.classes_)
 
+    def _classify(self, X):
+        if self.settings["calculate_metric"]:
+            predictions = self.svm.predict_proba(X)[:, self.classes.index(True)]
+            return [(bool(prediction > 0.5), prediction) for prediction in predictions]
+        else:
+            alerts = self.svm.predict(X)
+            return [(bool(alert), 1 if alert else 0) for alert in alerts]
+
     def new_state_msg(self, msg):
         state = super().new_state_msg(msg)
         if state is None:
             return False, None
 
-        if self.settings["calculate_metric"]:
-            prediction = self.svm.predict_proba([state])[0][self.classes.index(True)]
-            alert = bool(prediction > 0.5)
-            return alert, prediction
-        else:
-            alert = bool(self.svm.predict([state])[0])
-            return alert, 1 if alert else 0
+        return self._classify([state])[0]
 
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_state_msgs(self, msgs):
+        return self._classify_msgs(msgs, self._classify, (False, None))
+
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
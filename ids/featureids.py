@@ -1,13 +1,17 @@
-import json
 import math
+import numpy as np
 import time
 
 from collections.abc import Iterable
 
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
 from ipal_iids.utils import relative_to_config
 
-from preprocessors.utils import get_all_preprocessors
+from preprocessors.batch import columns_to_rows, flatten_columns, rows_to_columns
+from preprocessors.utils import get_preprocessor
+from .buffer import RowBuffer
+from .featureplan import FeaturePlan
 from .ids import MetaIDS
 
 
@@ -22,6 +26,7 @@ class FeatureIDS(MetaIDS):
         "allow-none": False,
     }
     _supports_preprocessor = True
+    _single_training_input = False  # Reject training on both messages and states
 
     preprocessors = []
 
@@ -39,6 +44,13 @@ class FeatureIDS(MetaIDS):
 
         self.preprocessors = []
         self.features = []
+        self._plan = None
+        self._layout = None
+
+        # Training data handed to the IDS message by message
+        self._events = None
+        self._annotations = None
+        self._timestamps = None
 
     def _get_val(self, msg, val):
         # Lookup value
@@ -54,66 +66,134 @@ class FeatureIDS(MetaIDS):
                     )
                 return None
 
-        if msg is None and self.settings["allow-none"]:
+        return self._parse_val(msg)
+
+    def _parse_val(self, val):
+        if val is None and self.settings["allow-none"]:
             return None
 
         # Try to parse as float
         try:
-            val = float(msg)
+            val = float(val)
             if not math.isnan(val):
                 return val
             else:
                 settings.logger.warning("Found Nan in data. Replacing with '0'")
                 return 0
         except ValueError:  # Non-float data
-            return msg
+            return val
 
     def _extract_features(self, msg):
-        if ["hash"] in self.features:
-            self._add_msg_hash(msg, nbytes=2)
-
-        return [self._get_val(msg, feature) for feature in self.features]
+        # Compile the feature list once into an extraction plan
+        if self._plan is None or self._plan.features is not self.features:
+            self._plan = FeaturePlan(self.features)
 
-    # the IDS is given the path to file(s) containing its requested training data
-    def train(self, state=None):
+        if self._plan.hash:
+            self._add_msg_hash(msg, nbytes=2)
 
+        try:
+            values = self._plan.lookup(msg)
+        except (
+            KeyError,
+            IndexError,
+            TypeError,
+        ):  # Resolve one by one to log the missing feature
+            return [self._get_val(msg, feature) for feature in self.features]
+
+        return [
+            v if type(v) is float and v == v else self._parse_val(v) for v in values
+        ]
+
+    def training_input(self, ipal=None, state=None):
+        # FeatureIDSs train on either messages or states, states take precedence
+        if self._single_training_input and ipal and state:
+            settings.logger.error("Only state or message supported")
+            exit(1)
+
+        if state is not None:
+            return "train.state"
+        elif ipal is not None:
+            return "train.ipal"
+        return None
+
+    def _start_training(self):
         # Build preprocessors from settings
         for pre in self.settings["preprocessors"]:
             apply = [f in pre["features"] for f in self.settings["features"]]
-            self.preprocessors.append(get_all_preprocessors()[pre["method"]](apply))
+            preprocessor = get_preprocessor(pre["method"])
+
+            # Options declared by the preprocessor are passed along, others ignored
+            options = {}
+            for k, v in pre.items():
+                if k in preprocessor._default_settings:
+                    options[k] = v
+                elif k not in ["method", "features"]:
+                    settings.logger.warning(
+                        "Ignoring unknown option '{}' of preprocessor {}".format(
+                            k, pre["method"]
+                        )
+                    )
+
+            self.preprocessors.append(preprocessor(apply, **options))
 
         self.features = [f.split(";") for f in self.settings["features"]]
 
-        events = []
-        annotations = []
-        timestamps = []
+        self._events = RowBuffer(len(self.features))
+        self._annotations = []
+        self._timestamps = []
 
-        # Load features from training file
-        start = time.time()
-        settings.logger.info("Loading training file started at {}".format(start))
+    def new_train_msg(self, msg):
+        if self._events is None:
+            self._start_training()
 
-        with self._open_file(state) as state_file:
-            for msg in state_file.readlines():
-                msg = json.loads(msg)
-                state = self._extract_features(msg)
+        state = self._extract_features(msg)
 
-                if None not in state or self.settings["allow-none"]:
-                    events.append(state)
-                    annotations.append(msg["malicious"])
-                    timestamps.append(msg["timestamp"])
-                else:
-                    settings.logger.info("None in state. Skipping message!")
+        if None not in state or self.settings["allow-none"]:
+            self._events.append(state)
+            self._annotations.append(msg["malicious"])
+            self._timestamps.append(msg["timestamp"])
+        else:
+            settings.logger.info("None in state. Skipping message!")
+
+    # the IDS is given the path to file(s) containing its requested training data
+    def train(self, state=None):
+
+        # Load features from training file unless they were handed to the IDS already
+        if self._events is None:
+            start = time.time()
+            settings.logger.info("Loading training file started at {}".format(start))
+
+            self._start_training()
+            with self._open_file(state) as state_file:
+                for msg in state_file:
+                    self.new_train_msg(codec.loads(msg))
+
+            end = time.time()
+            settings.logger.info(
+                "Loading training file ended at {} ({}s)".format(end, end - start)
+            )
+
+        events = self._events.to_array()
+        annotations = self._annotations
+        timestamps = self._timestamps
+        self._events = self._annotations = self._timestamps = None
 
         end = time.time()
-        settings.logger.info(
-            "Loading training file ended at {} ({}s)".format(end, end - start)
-        )
+
+        # Preprocessors supporting it are trained and applied on all events at once.
+        # Numeric features without preprocessors are handed to the IDS as a float
+        # array, everything else takes the generic per-event path below
+        settings.logger.info("Raw features: {}".format(events[0].tolist()))
+        preprocessors = self.preprocessors
+        if self._batch_preprocessing():
+            events, preprocessors = self._fit_batch(events)
+        elif len(preprocessors) > 0 or events.dtype == object:
+            events = events.tolist()
 
         # Train and apply preprocessors
-        settings.logger.info("Raw features: {}".format(events[0]))
-        for pre in self.preprocessors:
+        for pre in preprocessors:
             pre.fit(events)
-            events = [pre.transform(e) for e in events]
+            events = [self._transform(pre, e, t) for e, t in zip(events, timestamps)]
 
             # Remove events, annotations and timestamps if event got removed
             events, annotations, timestamps = zip(
@@ -126,7 +206,9 @@ class FeatureIDS(MetaIDS):
             assert len(events) == len(annotations) == len(timestamps)
             settings.logger.info("{} features: {}".format(pre._name, events[0]))
 
-        events = [list(self.__flatten(e)) for e in events]
+        self._layout = self._compute_layout()
+        if not isinstance(events, np.ndarray):
+            events = [self._flatten_state(e) for e in events]
         settings.logger.info("Final features: {}".format(events[0]))
 
         end2 = time.time()
@@ -146,7 +228,7 @@ class FeatureIDS(MetaIDS):
             ) as f:
                 for e, a, t in zip(events[:N], annotations[:N], timestamps[:N]):
                     f.write(
-                        json.dumps(
+                        codec.dumps(
                             {
                                 "timestamp": t,
                                 "state": {i: e[i] for i in range(len(e))},
@@ -161,6 +243,75 @@ class FeatureIDS(MetaIDS):
 
         return events[:N], annotations[:N], timestamps[:N]
 
+    def _batch_preprocessing(self):
+        return len(self.preprocessors) > 0 and all(
+            pre._supports_batch for pre in self.preprocessors
+        )
+
+    def _fit_batch(self, events):
+        # Returns the preprocessed events and the preprocessors left to apply per event
+        columns, masks = rows_to_columns(events, len(self.features))
+
+        for k, pre in enumerate(self.preprocessors):
+            pre.fit_batch(columns, masks)
+            try:
+                columns, masks = pre.transform_batch(columns, masks)
+            except NotImplementedError:
+                return columns_to_rows(columns, masks), self.preprocessors[k:]
+
+            first = columns_to_rows([c[:1] for c in columns], [m[:1] for m in masks])
+            settings.logger.info("{} features: {}".format(pre._name, first[0]))
+
+        return flatten_columns(columns, masks), []
+
+    def _transform(self, pre, state, timestamp):
+        if pre._requires_timestamp:
+            return pre.transform(state, timestamp)
+        return pre.transform(state)
+
+    def _transform_state(self, state, timestamp=None):
+        for pre in self.preprocessors:
+            state = self._transform(pre, state, timestamp)
+
+        if state is None:
+            return None
+        else:
+            return self._flatten_state(state)
+
+    def _compute_layout(self):
+        # Position of each feature within the flat output of the preprocessors given
+        # as (feature, start, width) with width None for single values
+        widths = [None] * len(self.features)
+        for pre in self.preprocessors:
+            widths = pre.output_widths(widths)
+            if widths is None:  # No fixed layout
+                return None
+
+        layout = []
+        start = 0
+        for feature, width in enumerate(widths):
+            layout.append((feature, start, width))
+            start += 1 if width is None else width
+
+        return layout, start
+
+    def _flatten_state(self, state):
+        if self._layout is None:
+            return list(self.__flatten(state))
+
+        layout, size = self._layout
+        flat = [None] * size
+        for feature, start, width in layout:
+            value = state[feature]
+            if width is None:
+                flat[start] = value
+            elif type(value) is list and len(value) == width:
+                flat[start : start + width] = value
+            else:  # Irregular output, e.g., an unknown category
+                return list(self.__flatten(state))
+
+        return flat
+
     def new_state_msg(self, msg):
 
         state = self._extract_features(msg)
@@ -168,13 +319,60 @@ class FeatureIDS(MetaIDS):
             settings.logger.info("None in state. Skipping message")
             return None
 
-        for pre in self.preprocessors:
-            state = pre.transform(state)
+        return self._transform_state(state, msg["timestamp"])
 
-        if state is None:
-            return None
+    def _preprocess_batch(self, msgs):
+        # Returns the indices of the messages to classify and their feature vectors
+        index = []
+        states = []
+        for i, msg in enumerate(msgs):
+            state = self._extract_features(msg)
+            if None in state and not self.settings["allow-none"]:
+                settings.logger.info("None in state. Skipping message")
+                continue
+            index.append(i)
+            states.append(state)
+
+        if len(states) == 0:
+            return index, states
+
+        try:
+            columns, masks = rows_to_columns(states, len(self.features))
+            for pre in self.preprocessors:
+                columns, masks = pre.transform_batch(columns, masks)
+            return index, flatten_columns(columns, masks)
+
+        except NotImplementedError:  # Preprocess event by event instead
+            return index, [
+                self._transform_state(state, msgs[i]["timestamp"])
+                for i, state in zip(index, states)
+            ]
+
+    def _classify_msgs(self, msgs, classify, default):
+        # Preprocess the messages and classify all resulting feature vectors with a single call
+        if len(msgs) > 1 and self._batch_preprocessing():
+            index, states = self._preprocess_batch(msgs)
         else:
-            return list(self.__flatten(state))
+            states = [FeatureIDS.new_state_msg(self, msg) for msg in msgs]
+            index = [i for i in range(len(states)) if states[i] is not None]
+            states = [states[i] for i in index]
+
+        results = [default] * len(msgs)
+        if len(index) > 0:
+            if isinstance(states, np.ndarray):
+                X = states
+            else:
+                # Fill a preallocated float matrix, other data is left to NumPy
+                X = np.empty((len(states), len(states[0])))
+                try:
+                    for row, state in zip(X, states):
+                        row[:] = state
+                except (ValueError, TypeError):
+                    X = np.array(states)
+            for i, result in zip(index, classify(X)):
+                results[i] = result
+
+        return results
 
     def save_trained_model(self):
         model = {
@@ -194,5 +392,7 @@ class FeatureIDS(MetaIDS):
 
         for name, pre_model in model["preprocessors"]:
             self.preprocessors.append(
-                get_all_preprocessors()[name].from_fitted_model(pre_model)
+                get_preprocessor(name).from_fitted_model(pre_model)
             )
+
+        self._layout = self._compute_layout()
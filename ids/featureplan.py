@@ -0,0 +1,53 @@
+from operator import itemgetter
+
+
+class FeaturePlan:
+    """
+    Feature extraction compiled from a list of feature paths, e.g.,
+    [["state", "a"], ["state", "b"], ["type"]]. Features sharing the same path
+    prefix are looked up together with a single itemgetter call and written into
+    their positions of the resulting row.
+    """
+
+    def __init__(self, features):
+        self.features = features
+        self.width = len(features)
+        self.hash = ["hash"] in features
+
+        groups = {}
+        for position, path in enumerate(features):
+            prefix = tuple(path[:-1])
+            if prefix not in groups:
+                groups[prefix] = ([], [])
+            groups[prefix][0].append(path[-1])
+            groups[prefix][1].append(position)
+
+        self.groups = []
+        for prefix, (keys, positions) in groups.items():
+            if len(keys) == 1:
+                target = positions[0]
+            elif positions == list(range(positions[0], positions[-1] + 1)):
+                target = slice(positions[0], positions[-1] + 1)
+            else:
+                target = positions
+            self.groups.append((prefix, itemgetter(*keys), target))
+
+    def lookup(self, msg):
+        """
+        Returns the raw values of all features. Raises a KeyError, IndexError or
+        TypeError if a feature is missing.
+        """
+        row = [None] * self.width
+
+        for prefix, getter, target in self.groups:
+            value = msg
+            for key in prefix:
+                value = value[key]
+
+            if type(target) is list:
+                for position, v in zip(target, getter(value)):
+                    row[position] = v
+            else:  # single position or slice
+                row[target] = getter(value)
+
+        return row
@@ -74,6 +74,15 @@ class MetaIDS:
     def train(self, ipal=None, state=None):
         raise NotImplementedError
 
+    # IDSs may receive their training data message by message before train() is called. Then, the training file
+    # is read and parsed only once and shared with all other IDSs. Returns the consumed dataformat ("train.ipal" or
+    # "train.state") or None if the IDS loads its training data in train() by itself
+    def training_input(self, ipal=None, state=None):
+        return None
+
+    def new_train_msg(self, msg):
+        raise NotImplementedError
+
     # if a new ipal message is available during the intrustion detection phase, this function is called
     # with the message in json format. Return if an alert is thrown by this IDS
     def new_ipal_msg(self, msg):
@@ -84,6 +93,14 @@ class MetaIDS:
     def new_state_msg(self, msg):
         raise NotImplementedError
 
+    # during the live phase, messages may be handed to the IDS in batches. Returns a list with an (alert, metric)
+    # tuple for each message. IDSs may override these functions to classify all messages at once
+    def new_ipal_msgs(self, msgs):
+        return [self.new_ipal_msg(msg) for msg in msgs]
+
+    def new_state_msgs(self, msgs):
+        return [self.new_state_msg(msg) for msg in msgs]
+
     def save_trained_model(self):
         raise NotImplementedError
 
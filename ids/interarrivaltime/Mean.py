@@ -1,9 +1,15 @@
 import json
 import numpy as np
 
+from array import array
+
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
 from ids.ids import MetaIDS
 
+from .identifier import get_identifier_cache
+from .window import ArrivalWindows
+
 # This is an implementation of the two IDSs proposed in:
 #
 #    Lin, Chih-Yuan, Simin Nadjm-Tehrani, and Mikael Asplund. "Timing-based
@@ -26,43 +32,53 @@ class InterArrivalTimeMean(MetaIDS):
         self._add_default_settings(self._interarrivaltimemean_default_settings)
 
         self.mean_model = {}
-        self.sliding_windows = {}
+        self._identifiers = get_identifier_cache()
+        self.sliding_windows = ArrivalWindows(self.settings["W"])
+
+        # Timestamps for each identifier handed to the IDS during training, stored
+        # as compact arrays of doubles
+        self._events = None
 
     def _get_identifier(self, msg):
-        # compute event identifier by concatenating source, destination, activity, message type and accessed data
-        identifier = [
-            msg["src"].split(":")[0],
-            msg["dest"].split(":")[0],
-            msg["activity"],
-            str(msg["type"]),
-        ]
-        identifier += msg["data"].keys()
-        return "-".join([str(i) for i in identifier])
+        return self._identifiers.lookup(msg)
 
-    def train(self, ipal=None, state=None):
-        events = {}
+    def _reset_windows(self):
+        self.sliding_windows = ArrivalWindows(self.settings["W"])
+
+    def _add_window(self, identifier):
+        self.sliding_windows.add(self._identifiers.intern(identifier))
+
+    def training_input(self, ipal=None, state=None):
+        return "train.ipal" if ipal is not None else None
+
+    def new_train_msg(self, msg):
+        if self._events is None:
+            self._events = {}
 
-        # Load timestamps for each identifier
-        with self._open_file(ipal) as f:
-            for line in f.readlines():
-                ipal_msg = json.loads(line)
+        # Identifiers are interned once they are part of the trained model
+        identifier = self._identifiers.name(msg)
 
-                timestamp = ipal_msg["timestamp"]
-                identifier = self._get_identifier(ipal_msg)
+        if identifier not in self._events:
+            self._events[identifier] = array("d")
+        self._events[identifier].append(msg["timestamp"])
 
-                if identifier not in events:
-                    events[identifier] = []
-                events[identifier].append(timestamp)
+    def train(self, ipal=None, state=None):
+        # Load timestamps for each identifier unless they were handed to the IDS already
+        if self._events is None:
+            with self._open_file(ipal) as f:
+                for line in f:
+                    self.new_train_msg(codec.loads(line))
+
+        events = self._events or {}
+        self._events = None
 
         # Calculate inter-arrival time and mean model
+        self._reset_windows()
         settings.logger.info("Inter-arrival-time mean models:")
 
-        for k in events.keys():
+        for k, timestamps in events.items():
 
-            interevent_times = []
-
-            for i in range(len(events[k]) - 1):
-                interevent_times.append(events[k][i + 1] - events[k][i])
+            interevent_times = np.diff(np.frombuffer(timestamps))
 
             if len(interevent_times) <= self.settings["W"]:
                 settings.logger.warning("Only single window of type {}".format(k))
@@ -76,16 +92,14 @@ class InterArrivalTimeMean(MetaIDS):
             ll = max(0, ll)  # Only positive inter-arrival times
 
             self.mean_model[k] = {"ll": ll, "ul": ul, "mu": mu, "sigma": sigma}
-            self.sliding_windows[k] = {
-                "timestamp": [],
-                "malicious": [],
-                "interevents": [],
-            }
+            self._add_window(k)
 
             settings.logger.info(
                 "- {} [{}, {}] mean: {} sigma: {}".format(k, ll, ul, mu, sigma)
             )
 
+        self._identifiers.log_stats()
+
     def new_ipal_msg(self, msg):
 
         identifier = self._get_identifier(msg)
@@ -96,38 +110,22 @@ class InterArrivalTimeMean(MetaIDS):
         else:  # Known message
 
             # Slide window
-            if len(self.sliding_windows[identifier]["timestamp"]) == self.settings["W"]:
-                del self.sliding_windows[identifier]["timestamp"][0]
-                del self.sliding_windows[identifier]["malicious"][0]
-                del self.sliding_windows[identifier]["interevents"][0]
-
-            # Calculate inter-event time for last message
-            if len(self.sliding_windows[identifier]["timestamp"]) > 0:
-                intereventtime = (
-                    msg["timestamp"] - self.sliding_windows[identifier]["timestamp"][-1]
-                )
-                self.sliding_windows[identifier]["interevents"].append(intereventtime)
-
-            # Fill sliding window
-            self.sliding_windows[identifier]["timestamp"].append(msg["timestamp"])
-            self.sliding_windows[identifier]["malicious"].append(msg["malicious"])
+            _, _, oldest = self.sliding_windows.push(identifier, msg["timestamp"])
 
             # Reached desired window size?
-            if len(self.sliding_windows[identifier]["timestamp"]) < self.settings["W"]:
+            if oldest is None:
                 return False, 0
-            assert (
-                len(self.sliding_windows[identifier]["interevents"])
-                == self.settings["W"] - 1
-            )
 
-            # Check mean model
-            iet_mean = np.mean(self.sliding_windows[identifier]["interevents"])
-            alert = not (
-                self.mean_model[identifier]["ll"] < iet_mean
-                and iet_mean < self.mean_model[identifier]["ul"]
-            )
+            # Windows of a single message contain no inter-event times
+            if self.settings["W"] < 2:
+                return False, float("nan")
+
+            # Check mean model, the inter-event times sum up to the window's duration
+            iet_mean = (msg["timestamp"] - oldest) / (self.settings["W"] - 1)
+            model = self.mean_model[self._identifiers.names[identifier]]
+            alert = not (model["ll"] < iet_mean and iet_mean < model["ul"])
 
-            return alert, iet_mean - self.mean_model[identifier]["mu"]
+            return alert, iet_mean - model["mu"]
 
     def save_trained_model(self):
         if self.settings["model-file"] is None:
@@ -162,12 +160,9 @@ class InterArrivalTimeMean(MetaIDS):
         self.settings = model["settings"]
         self.mean_model = model["mean_model"]
 
+        self._reset_windows()
         for k in model["mean_model"].keys():
-            self.sliding_windows[k] = {
-                "timestamp": [],
-                "malicious": [],
-                "interevents": [],
-            }
+            self._add_window(k)
 
         return True
 
@@ -1,9 +1,15 @@
 import json
 import numpy as np
 
+from array import array
+
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
 from ids.ids import MetaIDS
 
+from .identifier import get_identifier_cache
+from .window import ArrivalWindows, WindowExtrema
+
 # This is an implementation of the two IDSs proposed in:
 #
 #    Lin, Chih-Yuan, Simin Nadjm-Tehrani, and Mikael Asplund. "Timing-based
@@ -26,43 +32,56 @@ class InterArrivalTimeRange(MetaIDS):
         self._add_default_settings(self._interarrivaltimerange_default_settings)
 
         self.range_model = {}
-        self.sliding_windows = {}
+        self._identifiers = get_identifier_cache()
+        self.sliding_windows = ArrivalWindows(self.settings["W"])
+        self.extrema = []
+
+        # Timestamps for each identifier handed to the IDS during training, stored
+        # as compact arrays of doubles
+        self._events = None
 
     def _get_identifier(self, msg):
-        # compute event identifier by concatenating source, destination, activity, message type and accessed data
-        identifier = [
-            msg["src"].split(":")[0],
-            msg["dest"].split(":")[0],
-            msg["activity"],
-            str(msg["type"]),
-        ]
-        identifier += msg["data"].keys()
-        return "-".join([str(i) for i in identifier])
+        return self._identifiers.lookup(msg)
 
-    def train(self, ipal=None, state=None):
-        events = {}
+    def _reset_windows(self):
+        self.sliding_windows = ArrivalWindows(self.settings["W"])
+        self.extrema = []
+
+    def _add_window(self, identifier):
+        self.sliding_windows.add(self._identifiers.intern(identifier))
+        self.extrema.append(WindowExtrema(self.settings["W"] - 1))
+
+    def training_input(self, ipal=None, state=None):
+        return "train.ipal" if ipal is not None else None
+
+    def new_train_msg(self, msg):
+        if self._events is None:
+            self._events = {}
+
+        # Identifiers are interned once they are part of the trained model
+        identifier = self._identifiers.name(msg)
 
-        # Load timestamps for each identifier
-        with self._open_file(ipal) as f:
-            for line in f.readlines():
-                ipal_msg = json.loads(line)
+        if identifier not in self._events:
+            self._events[identifier] = array("d")
+        self._events[identifier].append(msg["timestamp"])
 
-                timestamp = ipal_msg["timestamp"]
-                identifier = self._get_identifier(ipal_msg)
+    def train(self, ipal=None, state=None):
+        # Load timestamps for each identifier unless they were handed to the IDS already
+        if self._events is None:
+            with self._open_file(ipal) as f:
+                for line in f:
+                    self.new_train_msg(codec.loads(line))
 
-                if identifier not in events:
-                    events[identifier] = []
-                events[identifier].append(timestamp)
+        events = self._events or {}
+        self._events = None
 
         # Calculate inter-arrival time and range model
+        self._reset_windows()
         settings.logger.info("Inter-arrival-time range models:")
 
-        for k in events.keys():
-
-            interevent_times = []
+        for k, timestamps in events.items():
 
-            for i in range(len(events[k]) - 1):
-                interevent_times.append(events[k][i + 1] - events[k][i])
+            interevent_times = np.diff(np.frombuffer(timestamps))
 
             if len(interevent_times) <= self.settings["W"]:
                 settings.logger.warning("Only single window of type {}".format(k))
@@ -84,16 +103,14 @@ class InterArrivalTimeRange(MetaIDS):
             ll = np.min(Rj)
 
             self.range_model[k] = {"ll": ll, "ul": ul, "mu": mu, "sigma": sigma}
-            self.sliding_windows[k] = {
-                "timestamp": [],
-                "malicious": [],
-                "interevents": [],
-            }
+            self._add_window(k)
 
             settings.logger.info(
                 "- {} [{}, {}] mean: {} sigma: {}".format(k, ll, ul, mu, sigma)
             )
 
+        self._identifiers.log_stats()
+
     def new_ipal_msg(self, msg):
 
         identifier = self._get_identifier(msg)
@@ -104,40 +121,28 @@ class InterArrivalTimeRange(MetaIDS):
         else:  # Known message
 
             # Slide window
-            if len(self.sliding_windows[identifier]["timestamp"]) == self.settings["W"]:
-                del self.sliding_windows[identifier]["timestamp"][0]
-                del self.sliding_windows[identifier]["malicious"][0]
-                del self.sliding_windows[identifier]["interevents"][0]
+            slot, previous, oldest = self.sliding_windows.push(
+                identifier, msg["timestamp"]
+            )
 
             # Calculate inter-event time for last message
-            if len(self.sliding_windows[identifier]["timestamp"]) > 0:
-                intereventtime = (
-                    msg["timestamp"] - self.sliding_windows[identifier]["timestamp"][-1]
-                )
-                self.sliding_windows[identifier]["interevents"].append(intereventtime)
-
-            # Fill sliding window
-            self.sliding_windows[identifier]["timestamp"].append(msg["timestamp"])
-            self.sliding_windows[identifier]["malicious"].append(msg["malicious"])
+            if previous is not None:
+                self.extrema[slot].push(msg["timestamp"] - previous)
 
             # Reached desired window size?
-            if len(self.sliding_windows[identifier]["timestamp"]) < self.settings["W"]:
+            if oldest is None:
                 return False, 0
-            assert (
-                len(self.sliding_windows[identifier]["interevents"])
-                == self.settings["W"] - 1
-            )
+
+            # Windows of a single message contain no inter-event times
+            if self.settings["W"] < 2:
+                return False, float("nan")
 
             # Check range model
-            iet_range = np.max(
-                self.sliding_windows[identifier]["interevents"]
-            ) - np.min(self.sliding_windows[identifier]["interevents"])
-            alert = not (
-                self.range_model[identifier]["ll"] < iet_range
-                and iet_range < self.range_model[identifier]["ul"]
-            )
+            iet_range = self.extrema[slot].range()
+            model = self.range_model[self._identifiers.names[identifier]]
+            alert = not (model["ll"] < iet_range and iet_range < model["ul"])
 
-            return alert, iet_range - self.range_model[identifier]["mu"]
+            return alert, iet_range - model["mu"]
 
     def save_trained_model(self):
         if self.settings["model-file"] is None:
@@ -172,12 +177,9 @@ class InterArrivalTimeRange(MetaIDS):
         self.settings = model["settings"]
         self.range_model = model["range_model"]
 
+        self._reset_windows()
         for k in model["range_model"].keys():
-            self.sliding_windows[k] = {
-                "timestamp": [],
-                "malicious": [],
-                "interevents": [],
-            }
+            self._add_window(k)
 
         return True
 
@@ -0,0 +1,94 @@
+import sys
+
+from collections import OrderedDict
+
+import ipal_iids.settings as settings
+
+CACHE_SIZE = 65536  # Number of distinct message headers kept in the cache
+STATS_INTERVAL = 1000000  # Log the cache's hit rate every n lookups
+
+_shared = None
+
+
+class IdentifierCache:
+    """
+    Maps messages to small integer ids of their event type, which is identified by
+    the source and destination host, activity, message type and accessed data. The
+    textual identifier is constructed once per distinct message header without
+    ports, which is kept in a bounded LRU cache. Only identifiers of trained models
+    are interned to ids, all others map to UNKNOWN, such that live traffic with new
+    event types cannot grow the table.
+    """
+
+    UNKNOWN = -1
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.names = []  # id -> identifier
+        self.ids = {}  # identifier -> id
+
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, name):
+        if name not in self.ids:
+            self.ids[sys.intern(name)] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def _construct(self, src, dest, activity, msgtype, keys):
+        # compute event identifier by concatenating source, destination, activity, message type and accessed data
+        identifier = [src, dest, activity, msgtype]
+        identifier += keys
+        return "-".join([str(i) for i in identifier])
+
+    def name(self, msg):
+        # Identifiers consider hosts only, e.g., ephemeral client ports share an entry
+        key = (
+            msg["src"].partition(":")[0],
+            msg["dest"].partition(":")[0],
+            msg["activity"],
+            str(msg["type"]),  # 1, 1.0 and True are equal keys but distinct types
+            tuple(msg["data"]),
+        )
+
+        try:
+            name = self._cache[key]
+            self._cache.move_to_end(key)
+            self.hits += 1
+        except KeyError:
+            name = self._construct(*key)
+            self._cache[key] = name
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            self.misses += 1
+
+        if (self.hits + self.misses) % STATS_INTERVAL == 0:
+            self.log_stats()
+
+        return name
+
+    def lookup(self, msg):
+        return self.ids.get(self.name(msg), self.UNKNOWN)
+
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        settings.logger.info(
+            "Identifier cache: {} lookups, {:.1f}% hit rate, {} cached headers, {} identifiers".format(
+                lookups,
+                100 * self.hits / lookups if lookups > 0 else 0,
+                len(self._cache),
+                len(self.names),
+            )
+        )
+
+
+def get_identifier_cache():
+    # All inter-arrival-time IDSs share a single cache
+    global _shared
+
+    if _shared is None:
+        _shared = IdentifierCache(CACHE_SIZE)
+
+    return _shared
@@ -0,0 +1,82 @@
+from array import array
+from collections import deque
+
+
+class ArrivalWindows:
+    """
+    Sliding windows of the last W arrival times of each known identifier. The
+    windows are ring buffers within a single flat array of doubles, such that each
+    identifier costs a fixed W + 1 numbers and each message a constant number of
+    operations.
+    """
+
+    def __init__(self, W):
+        self.W = W
+        self.slots = {}
+        self.timestamps = array("d")
+        self.counts = array("q")  # Number of messages seen per identifier
+
+    def __contains__(self, identifier):
+        return identifier in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, identifier):
+        if identifier not in self.slots:
+            self.slots[identifier] = len(self.counts)
+            self.timestamps.extend([0.0] * self.W)
+            self.counts.append(0)
+
+    def push(self, identifier, timestamp):
+        """
+        Adds the arrival time to the window of the identifier. Returns the slot, the
+        previous arrival time (or None) and, once the window is complete, the
+        oldest arrival time within the window (or None).
+        """
+        slot = self.slots[identifier]
+        count = self.counts[slot]
+        base = slot * self.W
+
+        previous = self.timestamps[base + (count - 1) % self.W] if count > 0 else None
+        self.timestamps[base + count % self.W] = timestamp
+        self.counts[slot] = count + 1
+
+        if count + 1 < self.W:
+            return slot, previous, None
+        return slot, previous, self.timestamps[base + (count + 1) % self.W]
+
+
+class WindowExtrema:
+    """
+    Minimum and maximum of the last n values of a stream, maintained with monotonic
+    deques in amortized constant time per value.
+    """
+
+    __slots__ = ("n", "count", "maxs", "mins")
+
+    def __init__(self, n):
+        self.n = n
+        self.count = 0
+        self.maxs = deque()  # (index, value) with decreasing values
+        self.mins = deque()  # (index, value) with increasing values
+
+    def push(self, value):
+        while len(self.maxs) > 0 and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        while len(self.mins) > 0 and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.maxs.append((self.count, value))
+        self.mins.append((self.count, value))
+        self.count += 1
+
+        # Drop values that left the window
+        if self.maxs[0][0] <= self.count - 1 - self.n:
+            self.maxs.popleft()
+        if self.mins[0][0] <= self.count - 1 - self.n:
+            self.mins.popleft()
+
+    def range(self):
+        if len(self.maxs) == 0:  # No values within the window
+            return float("nan")
+        return self.maxs[0][1] - self.mins[0][1]
@@ -1,9 +1,52 @@
 import json
+import numpy as np
+
+from array import array
 
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
 
 
+class SlidingHistogram:
+    """
+    Histogram of the last window_size integer-coded values stored in a ring buffer.
+    Tracks how many buckets are outside their [lower, upper] bounds, such that each
+    update and validity check takes constant time regardless of the window size.
+    """
+
+    def __init__(self, window_size, lower, upper):
+        self.window = array("l", [0]) * window_size
+        self.size = window_size
+        self.pos = 0
+        self.fill = 0
+
+        self.lower = lower
+        self.upper = upper
+        self.counts = [0] * len(lower)
+        self.outside = sum(1 for lo, up in zip(lower, upper) if 0 < lo or up < 0)
+
+    def _count(self, code, delta):
+        before = self.lower[code] <= self.counts[code] <= self.upper[code]
+        self.counts[code] += delta
+        after = self.lower[code] <= self.counts[code] <= self.upper[code]
+        self.outside += before - after
+
+    def push(self, code):
+        if self.fill == self.size:  # Drop the oldest value
+            self._count(self.window[self.pos], -1)
+        else:
+            self.fill += 1
+
+        self._count(code, 1)
+        self.window[self.pos] = code
+        self.pos = (self.pos + 1) % self.size
+
+        return self.fill == self.size
+
+    def is_valid(self):
+        return self.outside == 0
+
+
 class Histogram(FeatureIDS):
 
     _name = "Histogram"
@@ -25,22 +68,40 @@ class Histogram(FeatureIDS):
         self._reset()
 
     def _reset(self):
-        self._cur = {}
-        self._buffer = {}
+        self._codes = {}
+        self._windows = {}
 
     def _update(self, sensor, value):
 
-        if sensor not in self._cur:
-            self._cur[sensor] = {i: 0 for i in self.hist[sensor].keys()}
-            self._buffer[sensor] = []
+        if sensor not in self._windows:
+            # Integer-code the values and precompute the accepted count per bucket
+            self._codes[sensor] = {val: i for i, val in enumerate(self.hist[sensor])}
+            lower, upper = [], []
+            for val, (tmin, tmax) in self.hist[sensor].items():
+                err = self.deltas[sensor][val] * self.settings["threshold"]
+                lower.append(tmin - err)
+                upper.append(tmax + err)
+            self._windows[sensor] = SlidingHistogram(
+                self.settings["window_size"], lower, upper
+            )
 
-        self._cur[sensor][value] += 1
-        self._buffer[sensor].append(value)
+        return self._windows[sensor].push(self._codes[sensor][value])
 
-        if len(self._buffer[sensor]) > self.settings["window_size"]:
-            self._cur[sensor][self._buffer[sensor].pop(0)] -= 1
+    def _window_counts(self, column, vals):
+        # Number of occurrences of each value in all complete windows using
+        # cumulative counts. Returns an array of shape (len(vals), #windows)
+        codes = {val: i for i, val in enumerate(vals)}
+        coded = np.fromiter(
+            (codes[v] for v in column), dtype=np.intp, count=len(column)
+        )
 
-        return len(self._buffer[sensor]) == self.settings["window_size"]
+        window_size = self.settings["window_size"]
+        counts = np.empty((len(vals), max(len(column) - window_size + 1, 0)), int)
+        for i in range(len(vals)):
+            occurrences = np.concatenate([[0], np.cumsum(coded == i)])
+            counts[i] = occurrences[window_size:] - occurrences[:-window_size]
+
+        return counts
 
     def train(self, ipal=None, state=None):
         if ipal is not None and state is not None:
@@ -55,41 +116,24 @@ class Histogram(FeatureIDS):
         if len(set(annotations) - set([False])) > 0:
             settings.logger.warning("IDS expects benign data only!")
 
-        # Prepare data structures and find non-discrete values
-        hist = {}
+        # Find non-discrete values and train histograms on all windows at once
         for i in range(len(events[0])):
+            if isinstance(events, np.ndarray):
+                column = events[:, i].tolist()
+            else:
+                column = [e[i] for e in events]
 
-            vals = set([e[i] for e in events])
+            vals = set(column)
             if len(vals) > self.settings["discrete_threshold"]:  # Skip non-discrete
-                hist[i] = None
                 self.hist[i] = None
                 self.deltas[i] = None
-
-            else:  # Prepare histogram
-                hist[i] = {val: [] for val in vals}
-                self.hist[i] = {val: [self.settings["window_size"], 0] for val in vals}
-                self.deltas[i] = {val: None for val in vals}
-
-        # Train on input
-        for e in events:
-            for i in range(len(events[0])):  # For each sensor
-                if self.hist[i] is None:  # Skip non-discrete sensors
-                    continue
-
-                complete = self._update(i, e[i])
-                if complete:  # Store histogram
-                    for val in self.hist[i]:
-                        hist[i][val].append(self._cur[i][val])
-
-        # Calculate deltas and real values
-        for i in range(len(events[0])):
-
-            if self.hist[i] is None:  # Skip non-discrete sensors
                 settings.logger.info("Sensor {} ignored".format(i))
                 continue
 
-            for val in self.hist[i]:
-                self.hist[i][val] = [min(hist[i][val]), max(hist[i][val])]
+            self.hist[i] = {}
+            self.deltas[i] = {}
+            for val, counts in zip(vals, self._window_counts(column, list(vals))):
+                self.hist[i][val] = [int(np.min(counts)), int(np.max(counts))]
                 self.deltas[i][val] = (self.hist[i][val][1] - self.hist[i][val][0]) / 2
 
                 settings.logger.info(
@@ -106,15 +150,7 @@ class Histogram(FeatureIDS):
         self._reset()
 
     def _is_valid(self, sensor):
-        for val in self.hist[sensor]:  # One failed bucket suffices
-            tmin, tmax = self.hist[sensor][val]
-            err = self.deltas[sensor][val] * self.settings["threshold"]
-            cur = self._cur[sensor][val]
-
-            if cur < tmin - err or tmax + err < cur:  # Outside the histogram
-                return False
-
-        return True
+        return self._windows[sensor].is_valid()  # One failed bucket suffices
 
     def new_state_msg(self, msg):
         state = super().new_state_msg(msg)
@@ -1,4 +1,5 @@
 import json
+import numpy as np
 
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
@@ -32,14 +33,25 @@ class MinMax(FeatureIDS):
         if len(set(annotations) - set([False])) > 0:
             settings.logger.warning("IDS expects benign data only!")
 
-        # Train on input
+        # Train on input, column-wise on numeric data
+        if isinstance(events, np.ndarray):
+            mins = np.min(events, axis=0).tolist()
+            maxs = np.max(events, axis=0).tolist()
+            distinct = [len(np.unique(events[:, i])) for i in range(events.shape[1])]
+        else:
+            mins, maxs, distinct = [], [], []
+            for i in range(len(events[0])):
+                data = [e[i] for e in events if e[i] is not None]
+                mins.append(min(data))
+                maxs.append(max(data))
+                distinct.append(len(set(data)))
+
         for i in range(len(events[0])):
-            data = [e[i] for e in events if e[i] is not None]
-            self.mins[i] = min(data)
-            self.maxs[i] = max(data)
+            self.mins[i] = mins[i]
+            self.maxs[i] = maxs[i]
             self.deltas[i] = (self.maxs[i] - self.mins[i]) / 2
 
-            if len(set(data)) <= self.settings["discrete_threshold"]:
+            if distinct[i] <= self.settings["discrete_threshold"]:
                 self.deltas[i] = 0  # No threshold for discrete process values
 
             settings.logger.info(
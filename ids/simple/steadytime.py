@@ -1,4 +1,5 @@
 import json
+import numpy as np
 
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
@@ -49,6 +50,18 @@ class SteadyTime(FeatureIDS):
 
             return True, oldvalue, oldtime
 
+    def _block_lengths(self, column, vals):
+        # Run-length encoding of the column. Returns the value index and length of
+        # each completed block, i.e., all but the last block
+        codes = {val: i for i, val in enumerate(vals)}
+        coded = np.fromiter(
+            (codes[v] for v in column), dtype=np.intp, count=len(column)
+        )
+
+        ends = np.flatnonzero(coded[1:] != coded[:-1]) + 1
+        starts = np.concatenate([[0], ends])[:-1].astype(np.intp)
+        return coded[starts], ends - starts
+
     def train(self, ipal=None, state=None):
         if ipal is not None and state is not None:
             settings.logger.warning("Only state OR ipal supported. Using state now.")
@@ -62,41 +75,28 @@ class SteadyTime(FeatureIDS):
         if len(set(annotations) - set([False])) > 0:
             settings.logger.warning("IDS expects benign data only!")
 
-        # Prepare data structures and find non-discrete values
-        time = {}
+        # Find non-discrete values and train on all blocks of equal values at once
         for i in range(len(events[0])):
+            if isinstance(events, np.ndarray):
+                column = events[:, i].tolist()
+            else:
+                column = [e[i] for e in events]
 
-            vals = set([e[i] for e in events])
+            vals = set(column)
             if len(vals) > self.settings["discrete_threshold"]:  # Skip non-discrete
-                time[i] = None
                 self.time[i] = None
                 self.deltas[i] = None
-
-            else:  # Prepare time
-                time[i] = {val: [] for val in vals}
-                self.time[i] = {val: None for val in vals}
-                self.deltas[i] = {val: None for val in vals}
-
-        # Train on input
-        for e in events:
-            for i in range(len(events[0])):  # For each sensor
-                if self.time[i] is None:  # Skip non-discrete sensors
-                    continue
-
-                complete, val, t = self._update(i, e[i])
-                if complete:  # Store time
-                    time[i][val].append(t)
-
-        # Calculate deltas and real values
-        for i in range(len(events[0])):
-
-            if self.time[i] is None:  # Skip non-discrete sensors
                 settings.logger.info("Sensor {} ignored".format(i))
                 continue
 
-            for val in self.time[i]:
-                if len(time[i][val]) > 0:
-                    self.time[i][val] = [min(time[i][val]), max(time[i][val])]
+            self.time[i] = {val: None for val in vals}
+            self.deltas[i] = {val: None for val in vals}
+            blocks, lengths = self._block_lengths(column, list(vals))
+
+            for k, val in enumerate(vals):
+                time = lengths[blocks == k]
+                if len(time) > 0:
+                    self.time[i][val] = [int(np.min(time)), int(np.max(time))]
                     self.deltas[i][val] = (
                         self.time[i][val][1] - self.time[i][val][0]
                     ) / 2
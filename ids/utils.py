@@ -1,39 +1,36 @@
-from .autoregression.Autoregression import Autoregression
-from .classifier.BLSTM import BLSTM
-from .classifier.DecisionTree import DecisionTree
-from .classifier.ExtraTrees import ExtraTrees
-from .classifier.IsolationForest import IsolationForest
-from .classifier.NaiveBayes import NaiveBayes
-from .classifier.RandomForest import RandomForest
-from .classifier.SVM import SVM
-from .interarrivaltime.Mean import InterArrivalTimeMean
-from .interarrivaltime.Range import InterArrivalTimeRange
-from .simple.histogram import Histogram
-from .simple.minmax import MinMax
-from .simple.steadytime import SteadyTime
-from .oracles.OptimalIDS import OptimalIDS
-from .oracles.DummyIDS import DummyIDS
-from .oracles.PrecomputedIDS import PrecomputedIDS
+import importlib
 
-idss = [
-    Autoregression,
-    BLSTM,
-    DecisionTree,
-    DummyIDS,
-    ExtraTrees,
-    Histogram,
-    InterArrivalTimeMean,
-    InterArrivalTimeRange,
-    IsolationForest,
-    MinMax,
-    NaiveBayes,
-    OptimalIDS,
-    RandomForest,
-    SVM,
-    SteadyTime,
-    PrecomputedIDS,
-]
+# IDSs are imported lazily, i.e., only if a config references them. Some of them
+# depend on heavy libraries (e.g., tensorflow or sklearn) which would otherwise
+# slow down the startup of ipal-iids considerably.
+idss = {
+    "Autoregression": "ids.autoregression.Autoregression.Autoregression",
+    "BLSTM": "ids.classifier.BLSTM.BLSTM",
+    "DecisionTree": "ids.classifier.DecisionTree.DecisionTree",
+    "Dummy": "ids.oracles.DummyIDS.DummyIDS",
+    "ExtraTrees": "ids.classifier.ExtraTrees.ExtraTrees",
+    "Histogram": "ids.simple.histogram.Histogram",
+    "inter-arrival-mean": "ids.interarrivaltime.Mean.InterArrivalTimeMean",
+    "inter-arrival-range": "ids.interarrivaltime.Range.InterArrivalTimeRange",
+    "IsolationForest": "ids.classifier.IsolationForest.IsolationForest",
+    "MinMax": "ids.simple.minmax.MinMax",
+    "NaiveBayes": "ids.classifier.NaiveBayes.NaiveBayes",
+    "Optimal": "ids.oracles.OptimalIDS.OptimalIDS",
+    "RandomForest": "ids.classifier.RandomForest.RandomForest",
+    "SVM": "ids.classifier.SVM.SVM",
+    "Steadytime": "ids.simple.steadytime.SteadyTime",
+    "Precomputed": "ids.oracles.PrecomputedIDS.PrecomputedIDS",
+}
+
+
+def get_ids_names():
+    return list(idss.keys())
+
+
+def get_ids(name):
+    module, cls = idss[name].rsplit(".", 1)
+    return getattr(importlib.import_module(module), cls)
 
 
 def get_all_iidss():
-    return {ids._name: ids for ids in idss}
+    return {name: get_ids(name) for name in idss}
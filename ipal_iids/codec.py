@@ -0,0 +1,80 @@
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Available JSON backends:
+# - auto: parse with orjson if installed, serialize with the standard library.
+#         The output is byte-identical to the standard library.
+# - orjson: parse and serialize with orjson. The output is compact, i.e., without
+#           whitespace after separators.
+# - json: standard library only
+backends = ["auto", "orjson", "json"]
+backend = None
+
+loads = json.loads
+dumps = json.dumps
+
+
+def _orjson_loads(s):
+    try:
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:  # e.g., NaN, Infinity or integers beyond 64 bit
+        return json.loads(s)
+
+
+def _tolist(obj):
+    # NumPy arrays and scalars for the standard library
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj)))
+
+
+def _non_finite(obj):
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    elif isinstance(obj, dict):
+        return any(_non_finite(v) for v in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return any(_non_finite(v) for v in obj)
+    elif hasattr(obj, "tolist"):
+        return _non_finite(obj.tolist())
+    return False
+
+
+def _orjson_dumps(obj):
+    try:
+        s = orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    except TypeError:  # e.g., integers beyond 64 bit
+        return json.dumps(obj, default=_tolist)
+
+    # orjson writes NaN and Infinity as null, only search for them if null occurs
+    if b"null" in s and _non_finite(obj):
+        return json.dumps(obj, default=_tolist)
+
+    return s.decode()
+
+
+def set_backend(name):
+    """
+    Select the JSON backend used for IPAL messages. Raises a ValueError if the
+    backend is unknown or not installed.
+    """
+    global backend, loads, dumps
+
+    if name not in backends:
+        raise ValueError("Unknown JSON backend '{}'".format(name))
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON backend 'orjson' is not installed")
+
+    backend = name
+    loads = _orjson_loads if name != "json" and orjson is not None else json.loads
+    dumps = _orjson_dumps if name == "orjson" else json.dumps
+
+
+set_backend("auto")
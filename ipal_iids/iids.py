@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import argparse
-import gzip
+import itertools
 import json
 import logging
 import os
@@ -8,19 +8,19 @@ import sys
 import time
 
 from pathlib import Path
-from combiner.utils import get_all_combiners
+from combiner.utils import get_combiner, get_combiner_names
 
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
-from ids.utils import get_all_iidss
-from ipal_iids.utils import filter_keys
-
-
-# Wrapper for hiding .gz files
-def open_file(filename, mode):
-    if filename.endswith(".gz"):
-        return gzip.open(filename, mode=mode, compresslevel=settings.compresslevel)
-    else:
-        return open(filename, mode=mode, buffering=1)
+from ids.utils import get_ids, get_ids_names
+from ipal_iids.parallel import IDSWorkerPool, replay_sharded, train_idss_parallel
+from ipal_iids.utils import (
+    filter_keys,
+    open_file,
+    FlushingWriter,
+    LineReader,
+    is_stream,
+)
 
 
 # Initialize logger
@@ -54,7 +54,7 @@ def dump_ids_default_config(name):
     config = {
         name: {
             "_type": name,
-            **get_all_iidss()[name](name=name)._default_settings,
+            **get_ids(name)(name=name)._default_settings,
         }
     }
     config[name]["model-file"] = "./model"
@@ -163,6 +163,24 @@ def prepare_arg_parser(parser):
         required=False,
     )
 
+    # Parallel training
+    parser.add_argument(
+        "--train-workers",
+        dest="train_workers",
+        metavar="INT",
+        default=1,
+        help="number of IDSs trained concurrently, each in its own process. (Default: 1)",
+        required=False,
+    )
+    parser.add_argument(
+        "--train-cpus",
+        dest="train_cpus",
+        metavar="INT",
+        default=None,
+        help="number of CPUs each concurrently trained IDS may use. Caps the 'jobs' setting and the threads of numerical libraries to avoid oversubscription. (Default: number of CPUs / train workers)",
+        required=False,
+    )
+
     # Logging
     parser.add_argument(
         "--log",
@@ -180,6 +198,70 @@ def prepare_arg_parser(parser):
         required=False,
     )
 
+    # Live batching
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        metavar="INT",
+        default=1,
+        help="number of live messages handed to the IDSs at once. Classifiers process a whole batch with a single call, which speeds up the offline replay of large datasets. (Default: 1)",
+        required=False,
+    )
+    parser.add_argument(
+        "--batch-latency",
+        dest="batch_latency",
+        metavar="MS",
+        default=None,
+        help="process a batch early once its oldest message waited the given number of milliseconds. Live inputs that may go idle, e.g., pipes, are read in the background to process a partial batch once its time is up. (Default: none)",
+        required=False,
+    )
+    parser.add_argument(
+        "--live-workers",
+        dest="live_workers",
+        metavar="INT",
+        default=1,
+        help="number of worker processes the IDSs are distributed to during the live phase. Each worker classifies all messages in order with its group of IDSs. Works best with larger batches. (Default: 1)",
+        required=False,
+    )
+    parser.add_argument(
+        "--shards",
+        dest="shards",
+        metavar="INT",
+        default=1,
+        help="replay a single live input file in INT shards of consecutive messages, each processed by its own process. The outputs are written in order. (Default: 1)",
+        required=False,
+    )
+    parser.add_argument(
+        "--shard-warmup",
+        dest="shard_warmup",
+        metavar="INT",
+        default=1000,
+        help="number of messages preceding a shard that are classified but not written to rebuild the state of windowed IDSs, preprocessors and combiners. The output equals a sequential replay if no IDS depends on more history than the warm-up. Otherwise, alerts may differ within the first messages of a shard. (Default: 1000)",
+        required=False,
+    )
+
+    # Output flush policy
+    parser.add_argument(
+        "--flush",
+        dest="flush",
+        metavar="POLICY",
+        default="message",
+        help="when to flush the output files: 'message' after every message, 'N' every N messages, 'Tms' at most T milliseconds after a message was written, or 'exit' only when done. Use 'message' or 'Tms' for live taps with bounded latency and 'exit' for fast offline replay. (Default: message)",
+        required=False,
+    )
+
+    # JSON backend
+    parser.add_argument(
+        "--json-backend",
+        dest="json_backend",
+        metavar="STR",
+        default="auto",
+        help="JSON library used to parse and serialize IPAL messages ({}). 'auto' parses with orjson if installed and writes the same output as the standard library, 'orjson' writes compact output. (Default: auto)".format(
+            ", ".join(codec.backends)
+        ),
+        required=False,
+    )
+
     # Gzip compress level
     parser.add_argument(
         "--compresslevel",
@@ -189,22 +271,30 @@ def prepare_arg_parser(parser):
         help="set the gzip compress level. 0 no compress, 1 fast/large, ..., 9 slow/tiny. (Default: 9)",
         required=False,
     )
+    parser.add_argument(
+        "--gzip-threads",
+        dest="gzip_threads",
+        metavar="INT",
+        default=1,
+        help="number of threads compressing '*.gz' outputs in parallel. With more than one thread, '*.gz' inputs are decompressed ahead in a background thread, and flushing a '*.gz' output only writes blocks of at least 32 KiB, the rest is written on exit. (Default: 1)",
+        required=False,
+    )
 
 
 # Returns IDS according to the provided config
 def parse_ids_arguments():
-    all_idss = get_all_iidss()
-    all_combiners = get_all_combiners()
+    all_idss = get_ids_names()
+    all_combiners = get_combiner_names()
 
     idss = []
     combiners = []
 
-    # IDS defined by config file
+    # IDS defined by config file. Only the referenced IDSs/combiners are imported
     for name, config in settings.idss.items():
         if config["_type"] in all_idss:
-            idss.append(all_idss[config["_type"]](name=name))
+            idss.append(get_ids(config["_type"])(name=name))
         elif config["_type"] in all_combiners:
-            combiners.append(all_combiners[config["_type"]](name=name))
+            combiners.append(get_combiner(config["_type"])(name=name))
         else:
             settings.logger.error(
                 f"Invalid config: unknown IDS/Combiner type: {config['_type']}"
@@ -235,6 +325,96 @@ def load_settings(args):  # noqa: C901
             )
             exit(1)
 
+    try:
+        settings.gzip_threads = int(args.gzip_threads)
+    except ValueError:
+        settings.gzip_threads = 0
+    if settings.gzip_threads < 1:
+        settings.logger.error("Option '--gzip-threads' must be a positive integer")
+        exit(1)
+
+    # Live batching
+    try:
+        settings.batch_size = int(args.batch_size)
+        if args.batch_latency is not None:
+            settings.batch_latency = float(args.batch_latency)
+    except ValueError:
+        settings.logger.error(
+            "Options '--batch-size' and '--batch-latency' must be numbers"
+        )
+        exit(1)
+
+    if settings.batch_size < 1:
+        settings.logger.error("Option '--batch-size' must be at least 1")
+        exit(1)
+
+    try:
+        settings.live_workers = int(args.live_workers)
+    except ValueError:
+        settings.live_workers = 0
+    if settings.live_workers < 1:
+        settings.logger.error("Option '--live-workers' must be a positive integer")
+        exit(1)
+
+    # Sharded replay
+    try:
+        settings.shards = int(args.shards)
+        settings.shard_warmup = int(args.shard_warmup)
+    except ValueError:
+        settings.shards = settings.shard_warmup = -1
+    if settings.shards < 1 or settings.shard_warmup < 0:
+        settings.logger.error(
+            "Options '--shards' and '--shard-warmup' must be positive integers"
+        )
+        exit(1)
+
+    # Parallel training
+    try:
+        settings.train_workers = int(args.train_workers)
+        if args.train_cpus is not None:
+            settings.train_cpus = int(args.train_cpus)
+        else:
+            settings.train_cpus = max(
+                1, (os.cpu_count() or 1) // settings.train_workers
+            )
+    except ValueError:
+        settings.train_workers = settings.train_cpus = 0
+    if settings.train_workers < 1 or settings.train_cpus < 1:
+        settings.logger.error(
+            "Options '--train-workers' and '--train-cpus' must be positive integers"
+        )
+        exit(1)
+
+    # Output flush policy
+    settings.flush = args.flush
+    try:
+        if args.flush == "message":
+            settings.flush_messages, settings.flush_interval = 1, None
+        elif args.flush == "exit":
+            settings.flush_messages, settings.flush_interval = None, None
+        elif args.flush.endswith("ms"):
+            settings.flush_messages = None
+            settings.flush_interval = float(args.flush[:-2])
+            if settings.flush_interval < 0:
+                raise ValueError()
+        else:
+            settings.flush_messages, settings.flush_interval = int(args.flush), None
+            if settings.flush_messages < 1:
+                raise ValueError()
+    except ValueError:
+        settings.logger.error(
+            "Option '--flush' must be 'message', 'exit', a positive number of messages or a time in milliseconds like '100ms'"
+        )
+        exit(1)
+
+    # JSON backend
+    try:
+        codec.set_backend(args.json_backend)
+        settings.json_backend = args.json_backend
+    except ValueError as e:
+        settings.logger.error("Option '--json-backend': {}".format(e))
+        exit(1)
+
     # Catch incompatible combinations
     if not args.config:
         settings.logger.error("no IDS configuration provided, exiting")
@@ -281,6 +461,13 @@ def load_settings(args):  # noqa: C901
         else:
             settings.live_combinerfd = sys.stdin
 
+    if settings.shards > 1:
+        inputs = [settings.live_ipal, settings.live_state, settings.live_combiner]
+        inputs = [i for i in inputs if i is not None]
+        if len(inputs) != 1 or inputs[0] in ["-", "stdin", "stdout"]:
+            settings.logger.error("Option '--shards' requires a single live input file")
+            exit(1)
+
     # Parse retrain
     if args.retrain:
         settings.retrain = True
@@ -336,6 +523,48 @@ def load_settings(args):  # noqa: C901
         exit(1)
 
 
+def load_training_data(idss):
+    # Group IDSs by the training file they consume message by message
+    consumers = {settings.train_ipal: [], settings.train_state: []}
+    for ids in idss:
+        dataformat = ids.training_input(
+            ipal=settings.train_ipal, state=settings.train_state
+        )
+        if dataformat == "train.ipal":
+            consumers[settings.train_ipal].append(ids)
+        elif dataformat == "train.state":
+            consumers[settings.train_state].append(ids)
+
+    for filename, consumer in consumers.items():
+        if filename is None or len(consumer) == 0:
+            continue
+
+        names = ", ".join([ids._name for ids in consumer])
+        start = time.time()
+        settings.logger.info(
+            "Loading training file {} for {} started at {}".format(
+                filename, names, start
+            )
+        )
+
+        parse_time = 0
+        with open_file(filename, "rt") as f:
+            for line in f:
+                parse_start = time.time()
+                msg = codec.loads(line)
+                parse_time += time.time() - parse_start
+
+                for ids in consumer:
+                    ids.new_train_msg(msg)
+
+        end = time.time()
+        settings.logger.info(
+            "Loading training file {} ended at {} ({}s, parsing {}s, feature extraction {}s)".format(
+                filename, end, end - start, parse_time, end - start - parse_time
+            )
+        )
+
+
 def train_idss(idss):
     # Try to load an existing model from file
     loaded_from_file = []
@@ -368,31 +597,45 @@ def train_idss(idss):
         )
         exit(1)
 
+    # Read and parse the training files only once for all IDSs
+    load_training_data([ids for ids in idss if ids not in loaded_from_file])
+
     # Give the various IDSs the dataset they need in their learning phase
-    for ids in idss:
-        if ids in loaded_from_file:
-            continue
+    training = [ids for ids in idss if ids not in loaded_from_file]
 
-        start = time.time()
-        settings.logger.info("Training of {} started at {}".format(ids._name, start))
+    if settings.train_workers > 1 and len(training) > 1:
+        train_idss_parallel(
+            training, settings.train_workers, settings.train_cpus, train_ids, save_ids
+        )
+    else:
+        for ids in training:
+            train_ids(ids)
+            save_ids(ids)
 
-        ids.train(ipal=settings.train_ipal, state=settings.train_state)
 
-        end = time.time()
+def train_ids(ids):
+    start = time.time()
+    settings.logger.info("Training of {} started at {}".format(ids._name, start))
+
+    ids.train(ipal=settings.train_ipal, state=settings.train_state)
+
+    end = time.time()
+    settings.logger.info(
+        "Training of {} ended at {} ({}s)".format(ids._name, end, end - start)
+    )
+
+
+def save_ids(ids):
+    # Try to save the trained model
+    try:
+        if ids.save_trained_model():
+            settings.logger.info("Saved trained model of {} to file.".format(ids._name))
+            return True
+    except NotImplementedError:
         settings.logger.info(
-            "Training of {} ended at {} ({}s)".format(ids._name, end, end - start)
+            "Saving model to file not implemented for {}.".format(ids._name)
         )
-
-        # Try to save the trained model
-        try:
-            if ids.save_trained_model():
-                settings.logger.info(
-                    "Saved trained model of {} to file.".format(ids._name)
-                )
-        except NotImplementedError:
-            settings.logger.info(
-                "Saving model to file not implemented for {}.".format(ids._name)
-            )
+    return False
 
 
 def init_ipal_combiner(msg, ids_names):
@@ -453,7 +696,7 @@ def train_combiners(idss, combiners):
         ipal_mode = bool(settings.train_combiner_ipal)
 
         for msg in f:
-            msg = json.loads(msg)
+            msg = codec.loads(msg)
 
             init_ipal_combiner(msg, ids_names)
 
@@ -472,6 +715,7 @@ def train_combiners(idss, combiners):
 
     # Save dataset to disk
     if settings.output_traincombiner:
+        output = FlushingWriter(settings.output_traincombinerfd)
         is_first = True
 
         for msg in msgs:
@@ -479,8 +723,9 @@ def train_combiners(idss, combiners):
                 msg["_iids-config"] = settings.iids_settings_to_dict()
                 is_first = False
 
-            settings.output_traincombinerfd.write(json.dumps(msg) + "\n")
-            settings.output_traincombinerfd.flush()
+            output.write(codec.dumps(msg) + "\n")
+
+        output.close()
 
     # Run combiner training with our loaded messages
     for combiner in trainable_combiners:
@@ -509,71 +754,158 @@ def train_combiners(idss, combiners):
     settings.logger.info("Combiner training finished.")
 
 
-def live_idss(idss, combiners):
+def classify_batch(idss, batch):
+    # Each IDS processes the batch in order. Consecutive messages of the same source are handed to the IDS at once
+    for ids in idss:
+        for source, group in itertools.groupby(batch, key=lambda entry: entry[0]):
+            msgs = [msg for _, msg in group]
+
+            if source == "ipal" and ids.requires("live.ipal"):
+                results = ids.new_ipal_msgs(msgs)
+            elif source == "state" and ids.requires("live.state"):
+                results = ids.new_state_msgs(msgs)
+            else:  # combiner msgs do not need an ids invocation
+                continue
+
+            for msg, (alert, metric) in zip(msgs, results):
+                msg["alerts"][ids._name] = alert
+                msg["metrics"][ids._name] = metric
+
+
+def combine_batch(combiners, batch):
+    # Combiners are independent of each other, thus each combines the whole batch at once
+    msgs = [msg for _, msg in batch]
+
+    for combiner in combiners:
+        for msg, (alert, metric) in zip(msgs, combiner.combine_msgs(msgs)):
+            msg["combiner_alerts"][combiner._name] = alert
+            msg["combiner_metrics"][combiner._name] = metric
+
+    # Take the output of the first combiner as global output
+    for msg in msgs:
+        msg["ids"] = msg["combiner_alerts"][combiners[0]._name]
+
+
+# Shards of a replay process the first warmup messages without writing them and stop after warmup + limit messages
+def live_idss(idss, combiners, warmup=0, limit=None, write_config=True):  # noqa: C901
     # Keep track of the last state and message information. Then we are capable of delivering them in the right order.
     msg_sources = {
-        "ipal": {"msg": None, "is_first": True, "fd": settings.live_ipalfd},
-        "state": {"msg": None, "is_first": True, "fd": settings.live_statefd},
-        "combiner": {"msg": None, "is_first": True, "fd": settings.live_combinerfd},
+        "ipal": {"msg": None, "is_first": write_config, "fd": settings.live_ipalfd},
+        "state": {"msg": None, "is_first": write_config, "fd": settings.live_statefd},
+        "combiner": {
+            "msg": None,
+            "is_first": write_config,
+            "fd": settings.live_combinerfd,
+        },
     }
     ids_names = [ids._name for ids in idss]
 
+    # Optionally, run groups of IDSs in worker processes
+    pool = None
+    if settings.live_workers > 1 and len(idss) > 1:
+        pool = IDSWorkerPool(
+            idss, min(settings.live_workers, len(idss)), classify_batch
+        )
+
+    output = FlushingWriter(settings.outputfd) if settings.output else None
+
+    # Inputs that may go idle are read in the background to bound the batch latency
+    if settings.batch_latency is not None and settings.batch_size > 1:
+        for msg_source in msg_sources.values():
+            if msg_source["fd"] and is_stream(msg_source["fd"]):
+                msg_source["fd"] = LineReader(msg_source["fd"])
+
+    # Messages are buffered and handed to the IDSs in batches of up to batch_size messages
+    batch = []
+    batch_start = None
+    is_first = []
+    write = []
+    count = 0
+
     while True:
         # load new msgs for all types
+        idle = False
         for msg_source in msg_sources.values():
             if msg_source["msg"] is None and msg_source["fd"]:
-                line = msg_source["fd"].readline()
+                if isinstance(msg_source["fd"], LineReader) and batch_start is not None:
+                    # Wait for the next message at most until the batch is due
+                    timeout = batch_start + settings.batch_latency / 1000 - time.time()
+                    line = msg_source["fd"].readline(timeout=max(0, timeout))
+                    if line is None:
+                        idle = True
+                        continue
+                else:
+                    line = msg_source["fd"].readline()
                 if line:
-                    msg_source["msg"] = json.loads(line)
+                    msg_source["msg"] = codec.loads(line)
 
         # filter out sources that do not have a message
         available_sources = {
             k: v for k, v in msg_sources.items() if v["msg"] is not None
         }
 
-        # Determine next msg based on timestamp: ipal, state or combiner
+        # Determine next msg based on timestamp: ipal, state or combiner. If an input
+        # is idle, its next message is unknown and the pending batch is processed
         source, source_entry = min(
             available_sources.items(),
             key=lambda item: item[1]["msg"]["timestamp"],
             default=(None, None),
         )
-        if source is None:  # handled all messages
-            break
 
-        msg = source_entry["msg"]
+        if idle or (limit is not None and count == warmup + limit):
+            source = None
 
-        init_ipal_combiner(msg, ids_names)
+        if source is not None:
+            msg = source_entry["msg"]
+            init_ipal_combiner(msg, ids_names)
 
-        for ids in idss:
-            if source == "ipal" and ids.requires("live.ipal"):
-                alert, metric = ids.new_ipal_msg(msg)
-            elif source == "state" and ids.requires("live.state"):
-                alert, metric = ids.new_state_msg(msg)
-            else:  # combiner msgs do not need an ids invocation
+            batch.append((source, msg))
+            is_first.append(source_entry["is_first"])
+            write.append(count >= warmup)
+            source_entry["is_first"] = False
+            source_entry["msg"] = None
+            count += 1
+
+            if batch_start is None:
+                batch_start = time.time()
+
+            # Wait for further messages unless the batch is full or the oldest message waited too long
+            if len(batch) < settings.batch_size and (
+                settings.batch_latency is None
+                or (time.time() - batch_start) * 1000 < settings.batch_latency
+            ):
                 continue
 
-            msg["alerts"][ids._name] = alert
-            msg["metrics"][ids._name] = metric
-
-        for combiner in combiners:
-            alert, metric = combiner.combine(msg)
-
-            msg["combiner_alerts"][combiner._name] = alert
-            msg["combiner_metrics"][combiner._name] = metric
+        if len(batch) == 0:  # handled all messages
+            break
 
-        # Take the output of the first combiner as global output
-        msg["ids"] = msg["combiner_alerts"][combiners[0]._name]
+        if pool is not None:
+            pool.classify_batch(batch)
+        else:
+            classify_batch(idss, batch)
+        combine_batch(combiners, batch)
 
         if settings.output:
+            for (_, msg), first, w in zip(batch, is_first, write):
+                if not w:  # warm-up message
+                    continue
+                if first:
+                    msg["_iids-config"] = settings.iids_settings_to_dict()
 
-            if source_entry["is_first"]:
-                msg["_iids-config"] = settings.iids_settings_to_dict()
-                source_entry["is_first"] = False
+                output.write(codec.dumps(msg) + "\n")
+
+        batch = []
+        batch_start = None
+        is_first = []
+        write = []
 
-            settings.outputfd.write(json.dumps(msg) + "\n")
-            settings.outputfd.flush()
+        if source is None and not idle:  # handled all messages
+            break
 
-        source_entry["msg"] = None
+    if output is not None:
+        output.close()
+    if pool is not None:
+        pool.close()
 
 
 def main():
@@ -588,7 +920,7 @@ def main():
     if not combiners:
         # Make sure there is at least one combiner
         settings.idss["DefaultOrCombiner"] = {"_type": "OrCombiner"}
-        combiners.append(get_all_combiners()["Or"](name="DefaultOrCombiner"))
+        combiners.append(get_combiner("Or")(name="DefaultOrCombiner"))
 
     try:
         # Train IDSs
@@ -601,7 +933,12 @@ def main():
 
         # Live IDS
         settings.logger.info("Start IDS live...")
-        live_idss(idss, combiners)
+        if settings.shards > 1:
+            replay_sharded(
+                idss, combiners, settings.shards, settings.shard_warmup, live_idss
+            )
+        else:
+            live_idss(idss, combiners)
     except BrokenPipeError:
         devnull = os.open(os.devnull, os.O_WRONLY)
         os.dup2(devnull, sys.stdout.fileno())
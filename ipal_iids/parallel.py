@@ -0,0 +1,426 @@
+import contextlib
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import shutil
+import tempfile
+import traceback
+
+import ipal_iids.codec as codec
+import ipal_iids.settings as settings
+from ipal_iids.utils import open_file
+
+
+def get_context():
+    """
+    The main process may already run threads, e.g., of pgzip, flush timers or
+    TensorFlow, which makes forking it unsafe. All worker processes are therefore
+    started from a fork server where available. The IDSs, combiners and settings
+    are pickled to them.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context()
+
+
+def _settings_snapshot():
+    # Plain settings, e.g., the IDS configuration and paths, without files or modules
+    return {
+        k: v
+        for k, v in vars(settings).items()
+        if not k.startswith("_")
+        and isinstance(v, (bool, int, float, str, list, dict, type(None)))
+    }
+
+
+def _restore_settings(snapshot):
+    vars(settings).update(snapshot)
+    logging.basicConfig(
+        filename=settings.logfile, level=settings.log, format=settings.logformat
+    )
+    settings.logger = logging.getLogger("ipal-iids")
+    codec.set_backend(settings.json_backend)
+
+
+def _pickle_ids(ids):
+    # IDSs and combiners that cannot be pickled, e.g., with TensorFlow models, load
+    # their saved model
+    try:
+        return ids._name, type(ids), pickle.dumps(ids, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        settings.logger.info(
+            "Cannot pickle {}, the worker loads its saved model".format(ids._name)
+        )
+        return ids._name, type(ids), None
+
+
+def _unpickle_ids(name, cls, state):
+    if state is not None:
+        return pickle.loads(state)
+
+    ids = cls(name=name)
+    if not ids.load_trained_model():
+        raise RuntimeError("Could not load the trained model of {}".format(name))
+    return ids
+
+
+def split(items, n):
+    # Split items into n contiguous groups of (almost) equal size keeping their order
+    return [items[i * len(items) // n : (i + 1) * len(items) // n] for i in range(n)]
+
+
+def _fields(msg):
+    # Top-level fields before classification. Dicts, e.g., "adjust", are copied since
+    # IDSs may add their entries in place
+    return {
+        k: dict(v) if isinstance(v, dict) else v
+        for k, v in msg.items()
+        if k not in ["alerts", "metrics"]
+    }
+
+
+def _changes(msg, original, ids_names):
+    # Fields an IDS added to or modified in the message, e.g., "hash" or "adjust"
+    alerts = {name: msg["alerts"][name] for name in ids_names if name in msg["alerts"]}
+    metrics = {
+        name: msg["metrics"][name] for name in ids_names if name in msg["metrics"]
+    }
+    fields = {
+        k: v
+        for k, v in msg.items()
+        if k not in ["alerts", "metrics"] and (k not in original or original[k] != v)
+    }
+    return alerts, metrics, fields
+
+
+def _ids_worker(snapshot, entries, classify, conn):
+    try:
+        _restore_settings(snapshot)
+        idss = [_unpickle_ids(*entry) for entry in entries]
+        ids_names = [ids._name for ids in idss]
+        error = None
+    except Exception:  # Reported once the first batch arrives
+        error = RuntimeError("IDS worker failed:\n" + traceback.format_exc())
+
+    while True:
+        payload = conn.recv_bytes()
+        if payload == b"":  # Shutdown
+            break
+        if error is not None:
+            conn.send(error)
+            continue
+
+        try:
+            batch = pickle.loads(payload)
+            originals = [_fields(msg) for _, msg in batch]
+            classify(idss, batch)
+
+            conn.send(
+                [
+                    _changes(msg, original, ids_names)
+                    for (_, msg), original in zip(batch, originals)
+                ]
+            )
+        except Exception:
+            conn.send(RuntimeError("IDS worker failed:\n" + traceback.format_exc()))
+            raise
+
+
+class IDSWorkerPool:
+    """
+    Runs groups of IDSs in worker processes. Every batch is sent to all workers,
+    which classify it with their IDSs in the original message order. Afterward,
+    alerts, metrics and modified message fields are merged back into the batch in
+    the order of the IDS configuration.
+    """
+
+    def __init__(self, idss, workers, classify):
+        context = get_context()
+        snapshot = _settings_snapshot()
+        self.groups = [group for group in split(idss, workers) if len(group) > 0]
+        self.processes = []
+        self.connections = []
+
+        for group in self.groups:
+            conn, child_conn = context.Pipe()
+            entries = [_pickle_ids(ids) for ids in group]
+            process = context.Process(
+                target=_ids_worker,
+                args=(snapshot, entries, classify, child_conn),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+
+            self.processes.append(process)
+            self.connections.append(conn)
+
+        settings.logger.info(
+            "Started {} IDS workers: {}".format(
+                len(self.groups),
+                "; ".join(", ".join(ids._name for ids in g) for g in self.groups),
+            )
+        )
+
+    def classify_batch(self, batch):
+        payload = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+        for conn in self.connections:
+            conn.send_bytes(payload)
+
+        for conn in self.connections:
+            results = conn.recv()
+            if isinstance(results, RuntimeError):
+                raise results
+
+            for (_, msg), (alerts, metrics, fields) in zip(batch, results):
+                msg["alerts"].update(alerts)
+                msg["metrics"].update(metrics)
+
+                for k, v in fields.items():
+                    if isinstance(msg.get(k), dict) and isinstance(v, dict):
+                        msg[k].update(v)  # e.g., adjust offsets of multiple IDSs
+                    else:
+                        msg[k] = v
+
+    def close(self):
+        for conn in self.connections:
+            conn.send_bytes(b"")
+        for process in self.processes:
+            process.join()
+
+
+def _train_worker(snapshot, name, state, cpus, train, save, conn):
+    try:
+        _restore_settings(snapshot)
+        ids = pickle.loads(state)
+
+        # Limit the CPUs used by the IDS, e.g., by GridSearchCV and BLAS threads
+        jobs = ids.settings.get("jobs")
+        if "jobs" in ids.settings and (jobs is None or jobs < 1 or jobs > cpus):
+            ids.settings["jobs"] = cpus
+
+        try:
+            from threadpoolctl import threadpool_limits
+
+            limits = threadpool_limits(limits=cpus)
+        except ImportError:
+            limits = contextlib.nullcontext()
+
+        with limits:
+            train(ids)
+
+        if "jobs" in ids.settings:
+            ids.settings["jobs"] = jobs
+
+        saved = save(ids)
+
+        # Hand the trained IDS back to the main process or let it load the saved model
+        try:
+            state = pickle.dumps(ids.__dict__, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            if not saved:
+                raise
+            state = None
+
+        conn.send(state)
+    except Exception:
+        conn.send(
+            RuntimeError(
+                "Training of {} failed:\n".format(name) + traceback.format_exc()
+            )
+        )
+
+
+def train_idss_parallel(idss, workers, cpus, train, save):
+    """
+    Trains the IDSs concurrently with up to workers processes, each using at most
+    cpus CPUs. The IDSs with their training data are pickled to the workers and
+    trained IDSs are pickled back to the main process. IDSs that cannot be pickled
+    back are loaded from their saved model file instead. IDSs that cannot be pickled
+    to a worker at all are trained in the main process afterward.
+    """
+    context = get_context()
+    snapshot = _settings_snapshot()
+    pending = list(idss)
+    local = []
+    running = {}
+
+    settings.logger.info(
+        "Training {} IDSs with {} workers and {} CPUs each".format(
+            len(idss), workers, cpus
+        )
+    )
+
+    while len(pending) > 0 or len(running) > 0:
+        while len(pending) > 0 and len(running) < workers:
+            ids = pending.pop(0)
+            try:
+                state = pickle.dumps(ids, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                settings.logger.info(
+                    "Cannot pickle {}, training it in the main process".format(
+                        ids._name
+                    )
+                )
+                local.append(ids)
+                continue
+
+            conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_train_worker,
+                args=(snapshot, ids._name, state, cpus, train, save, child_conn),
+            )
+            process.start()
+            child_conn.close()
+            running[conn] = (process, ids)
+
+        if len(running) == 0:
+            break
+
+        for conn in multiprocessing.connection.wait(list(running.keys())):
+            process, ids = running.pop(conn)
+            try:
+                state = conn.recv()
+            except EOFError:
+                state = RuntimeError("Training process of {} died".format(ids._name))
+            process.join()
+
+            if isinstance(state, RuntimeError):
+                for other, _ in running.values():
+                    other.terminate()
+                raise state
+
+            if state is not None:
+                state = pickle.loads(state)
+                ids.settings.clear()  # keep sharing the settings with settings.idss
+                ids.settings.update(state.pop("settings"))
+                ids.__dict__.update(state)
+            elif not ids.load_trained_model():
+                raise RuntimeError(
+                    "Could not load the trained model of {}".format(ids._name)
+                )
+
+    for ids in local:
+        train(ids)
+        save(ids)
+
+
+def _count_lines(filename):
+    lines = 0
+    last = b"\n"
+    with open_file(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    return lines + (last != b"\n")
+
+
+def _line_offsets(filename, lines):
+    # Byte offsets of the given line numbers. Compressed files are not seekable
+    if filename.endswith(".gz"):
+        return {line: None for line in lines}
+
+    offsets = {}
+    with open(filename, "rb") as f:
+        current = 0
+        for line in sorted(set(lines)):
+            while current < line:
+                f.readline()
+                current += 1
+            offsets[line] = f.tell()
+    return offsets
+
+
+def _replay_shard(
+    snapshot, entries, live, filename, first, offset, warmup, limit, part
+):
+    _restore_settings(snapshot)
+    idss, combiners = [[_unpickle_ids(*entry) for entry in group] for group in entries]
+
+    # Skip to the first warm-up message of the shard
+    fd = open_file(filename, "rb")
+    if offset is not None:
+        fd.seek(offset)
+    else:
+        for _ in range(first):
+            fd.readline()
+
+    settings.live_ipalfd = fd if settings.live_ipal else None
+    settings.live_statefd = fd if settings.live_state else None
+    settings.live_combinerfd = fd if settings.live_combiner else None
+    settings.outputfd = open(part, "w")
+
+    live(idss, combiners, warmup=warmup, limit=limit, write_config=first == 0)
+
+    settings.outputfd.close()
+    fd.close()
+
+
+def replay_sharded(idss, combiners, shards, warmup, live):
+    """
+    Replays a live input file in shards of consecutive messages, each processed in
+    its own process with the trained IDSs and combiners. Every shard first
+    classifies up to warmup preceding messages without writing them so that
+    windowed IDSs, preprocessors and combiners rebuild their state. The outputs of
+    all shards are written in order.
+    """
+    filename = settings.live_ipal or settings.live_state or settings.live_combiner
+    total = _count_lines(filename)
+
+    settings.logger.info(
+        "Replaying {} messages in {} shards with {} warm-up messages".format(
+            total, shards, warmup
+        )
+    )
+
+    context = get_context()
+    snapshot = _settings_snapshot()
+    entries = [[_pickle_ids(ids) for ids in idss], [_pickle_ids(c) for c in combiners]]
+    directory = tempfile.mkdtemp(prefix="ipal-iids-shards-")
+    parts = []
+    processes = []
+
+    try:
+        starts = [k * total // shards for k in range(shards)]
+        firsts = [max(0, start - warmup) for start in starts]
+        offsets = _line_offsets(filename, firsts)
+
+        for k, (start, end) in enumerate(zip(starts, starts[1:] + [total])):
+            part = os.path.join(directory, "shard-{}.ipal".format(k))
+            process = context.Process(
+                target=_replay_shard,
+                args=(
+                    snapshot,
+                    entries,
+                    live,
+                    filename,
+                    firsts[k],
+                    offsets[firsts[k]],
+                    start - firsts[k],
+                    end - start,
+                    part,
+                ),
+            )
+            process.start()
+            parts.append(part)
+            processes.append(process)
+
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError("Replay of a shard failed")
+
+        # Stitch the outputs together
+        if settings.output:
+            for part in parts:
+                with open(part, "r") as f:
+                    shutil.copyfileobj(f, settings.outputfd)
+            settings.outputfd.flush()
+
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        shutil.rmtree(directory)
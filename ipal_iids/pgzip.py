@@ -0,0 +1,214 @@
+import builtins
+import gzip
+import io
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Multi-threaded gzip files in the spirit of pigz. The writer splits the input into
+# blocks that are compressed in parallel. Each block is a raw deflate stream primed
+# with the last 32 KiB of the preceding data and terminated with a sync flush, so
+# that the concatenation of all blocks is a single valid gzip member. The reader
+# decompresses ahead in a background thread while the caller processes the data.
+# Flushing does not force small blocks, e.g., of single messages, which would be
+# compressed one at a time and with a poor ratio. Only buffers of at least
+# FLUSHSIZE bytes are compressed on flush, the rest waits for more data or close.
+
+BLOCKSIZE = 128 * 1024
+FLUSHSIZE = 32 * 1024
+DICTSIZE = 32 * 1024
+READSIZE = 1024 * 1024
+
+
+def _compress_block(block, dictionary, compresslevel, last):
+    if dictionary:
+        compressor = zlib.compressobj(
+            compresslevel,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL,
+            zlib.Z_DEFAULT_STRATEGY,
+            dictionary,
+        )
+    else:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    return compressor.compress(block) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    def __init__(self, filename, mode="w", compresslevel=9, threads=None):
+        self.compresslevel = compresslevel
+        self.threads = threads or os.cpu_count() or 1
+
+        self._file = builtins.open(filename, mode.replace("b", "") + "b")
+        self._pool = ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = deque()  # compressed blocks in order of the input
+
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+
+        # gzip header without file name
+        xfl = 2 if compresslevel == 9 else 4 if compresslevel == 1 else 0
+        self._file.write(
+            b"\x1f\x8b\x08\x00" + struct.pack("<IBB", int(time.time()), xfl, 255)
+        )
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        self._buffer += data
+        while len(self._buffer) >= BLOCKSIZE:
+            self._submit(bytes(self._buffer[:BLOCKSIZE]))
+            del self._buffer[:BLOCKSIZE]
+
+        return len(data)
+
+    def _submit(self, block, last=False):
+        self._crc = zlib.crc32(block, self._crc)
+        self._size += len(block)
+
+        self._pending.append(
+            self._pool.submit(
+                _compress_block, block, self._dictionary, self.compresslevel, last
+            )
+        )
+        self._dictionary = (self._dictionary + block)[-DICTSIZE:]
+
+        # Bound the number of blocks in flight
+        while len(self._pending) > 2 * self.threads:
+            self._file.write(self._pending.popleft().result())
+
+    def _drain(self, wait=True):
+        while len(self._pending) > 0 and (wait or self._pending[0].done()):
+            self._file.write(self._pending.popleft().result())
+
+    def flush(self):
+        if self.closed or self._file.closed:
+            return
+
+        if len(self._buffer) >= FLUSHSIZE:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+
+        # Write the blocks compressed so far without waiting for the others
+        self._drain(wait=False)
+        self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer.clear()
+            self._drain()
+
+            self._file.write(struct.pack("<II", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+            super().close()
+
+
+class ReadAheadGzipReader(io.RawIOBase):
+    def __init__(self, filename, chunks=4):
+        self._file = gzip.GzipFile(filename, "rb")
+        self._queue = queue.Queue(maxsize=chunks)
+        self._stop = threading.Event()
+
+        self._chunk = b""
+        self._offset = 0
+        self._eof = False
+
+        self._thread = threading.Thread(target=self._read_ahead, daemon=True)
+        self._thread.start()
+
+    def _read_ahead(self):
+        try:
+            while not self._stop.is_set():
+                data = self._file.read(READSIZE)
+                self._put(data)
+                if not data:
+                    break
+        except Exception as e:  # raised in the reading thread
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset == len(self._chunk):
+            if self._eof:
+                return 0
+
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+
+            self._chunk = item
+            self._offset = 0
+
+        n = min(len(b), len(self._chunk) - self._offset)
+        b[:n] = self._chunk[self._offset : self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+        super().close()
+
+
+def open(
+    filename,
+    mode="rb",
+    compresslevel=9,
+    threads=None,
+    encoding=None,
+    errors=None,
+    newline=None,
+):
+    """
+    Open a gzip compressed file like gzip.open, but compress with multiple threads
+    when writing and decompress ahead in a background thread when reading.
+    """
+    if "r" in mode:
+        binary = io.BufferedReader(ReadAheadGzipReader(filename))
+    else:
+        binary = ParallelGzipWriter(
+            filename, mode.replace("t", ""), compresslevel, threads
+        )
+
+    if "t" in mode:
+        return io.TextIOWrapper(binary, encoding, errors, newline)
+    return binary
@@ -1,12 +1,32 @@
 from io import TextIOWrapper
 import logging
 
-from ids.utils import get_all_iidss
+from ids.utils import get_ids_names
 
 version = "v1.2.1"
 
 # Gzip options
 compresslevel = 9  # 0 no compress, 1 large/fast, 9 small/slow
+gzip_threads = 1  # more than one compresses in parallel and decompresses ahead
+
+# Live batching
+batch_size = 1  # number of messages handed to the IDSs at once
+batch_latency = None  # in milliseconds, None waits until a batch is full
+live_workers = 1  # number of processes the IDSs are distributed to
+shards = 1  # number of processes a live file is replayed with
+shard_warmup = 1000  # messages preceding a shard to rebuild the IDS state
+
+# Parallel training
+train_workers = 1  # number of IDSs trained concurrently
+train_cpus = None  # CPUs per concurrently trained IDS
+
+# Output flush policy (message, N messages, T ms or exit)
+flush = "message"
+flush_messages = 1  # flush every N messages, None disables
+flush_interval = None  # flush at most T milliseconds after writing, None disables
+
+# JSON backend for IPAL messages (auto, orjson, json), see ipal_iids/codec.py
+json_backend = "auto"
 
 # In and output
 config = None
@@ -34,7 +54,7 @@ logformat = "%(levelname)s:%(name)s:%(message)s"
 logfile = None
 
 # IDS parameters
-idss = {ids._name: {"_type": ids._name} for ids in get_all_iidss().values()}
+idss = {name: {"_type": name} for name in get_ids_names()}
 
 
 def iids_settings_to_dict():
@@ -1,22 +1,11 @@
 #!/usr/bin/env python3
 import argparse
-import gzip
-import json
 import logging
-import sys
+import os
 
+import ipal_iids.codec as codec
 import ipal_iids.settings as settings
-
-
-def open_file(filename, mode="r"):
-    if filename is None:
-        return None
-    elif filename.endswith(".gz"):
-        return gzip.open(filename, mode=mode, compresslevel=settings.compresslevel)
-    elif filename == "-":
-        return sys.stdin
-    else:
-        return open(filename, mode=mode, buffering=1)
+from ipal_iids.utils import open_file
 
 
 # Initialize logger
@@ -50,6 +39,28 @@ def prepare_arg_parser(parser):
         nargs="+",
     )
 
+    # Gzip threads
+    parser.add_argument(
+        "--gzip-threads",
+        dest="gzip_threads",
+        metavar="INT",
+        default=1,
+        help="number of threads compressing '*.gz' files in parallel. (Default: 1)",
+        required=False,
+    )
+
+    # JSON backend
+    parser.add_argument(
+        "--json-backend",
+        dest="json_backend",
+        metavar="STR",
+        default="auto",
+        help="JSON library used to parse and serialize IPAL messages ({}). (Default: auto)".format(
+            ", ".join(codec.backends)
+        ),
+        required=False,
+    )
+
     # Logging
     parser.add_argument(
         "--log",
@@ -70,36 +81,35 @@ def prepare_arg_parser(parser):
 
 def extend_alarms(file):
 
-    ipal = []
-
-    # Load file into memory
-    with open_file(file, mode="r") as f:
-        for line in f.readlines():
-            ipal.append(json.loads(line))
-
-    # Extend alarms
-    for i in range(len(ipal)):
-        if "adjust" not in ipal[i]:
-            continue
-
-        if type(ipal[i]["adjust"]) is dict:
-            # We should adjust alerts and metrics
-            for ids_name, adjust in ipal[i]["adjust"].items():
-                for offset, alert, metric in adjust:
-                    assert offset <= 0
-
-                    if i + offset < 0:
-                        settings.logger.error(
-                            f"Offset is {offset + i}! Defaulting to dataset start."
-                        )
-                        offset = -i
-
-                    ipal[i + offset]["alerts"][ids_name] = alert
-                    ipal[i + offset]["metrics"][ids_name] = metric
-
-        else:
-            # Adjust alert
-            for offset, alert, metric in ipal[i]["adjust"]:
+    # First pass: collect the adjustments without loading the file into memory
+    updates = {}  # line -> list of (ids_name or None, alert, metric)
+    adjusted = set()  # lines carrying an "adjust" field
+
+    with open_file(file, mode="rt") as f:
+        for i, line in enumerate(f):
+            if '"adjust"' not in line:
+                continue
+
+            msg = codec.loads(line)
+            if "adjust" not in msg:
+                continue
+            adjusted.add(i)
+
+            if type(msg["adjust"]) is dict:
+                # We should adjust alerts and metrics
+                adjustments = [
+                    (ids_name, offset, alert, metric)
+                    for ids_name, adjust in msg["adjust"].items()
+                    for offset, alert, metric in adjust
+                ]
+            else:
+                # Adjust alert
+                adjustments = [
+                    (None, offset, alert, metric)
+                    for offset, alert, metric in msg["adjust"]
+                ]
+
+            for ids_name, offset, alert, metric in adjustments:
                 assert offset <= 0
 
                 if i + offset < 0:  # Log warning!
@@ -108,14 +118,30 @@ def extend_alarms(file):
                     )
                     offset = -i
 
-                ipal[i + offset]["ids"] = alert
+                updates.setdefault(i + offset, []).append((ids_name, alert, metric))
+
+    # Second pass: stream the file to a temporary file rewriting affected lines only
+    directory, basename = os.path.split(file)
+    tmpfile = os.path.join(directory, ".extend-alarms-" + basename)
+
+    with open_file(file, mode="rt") as f, open_file(tmpfile, "wt") as out:
+        for i, line in enumerate(f):
+            if i not in updates and i not in adjusted:
+                out.write(line)
+                continue
 
-        del ipal[i]["adjust"]
+            msg = codec.loads(line)
+            for ids_name, alert, metric in updates.get(i, []):
+                if ids_name is None:
+                    msg["ids"] = alert
+                else:
+                    msg["alerts"][ids_name] = alert
+                    msg["metrics"][ids_name] = metric
 
-    # Write file to disc
-    with open_file(file, "wt") as f:
-        for out in ipal:
-            f.write(json.dumps(out) + "\n")
+            msg.pop("adjust", None)
+            out.write(codec.dumps(msg) + "\n")
+
+    os.replace(tmpfile, file)
 
 
 def main():
@@ -125,6 +151,20 @@ def main():
     args = parser.parse_args()
     initialize_logger(args)
 
+    try:
+        settings.gzip_threads = int(args.gzip_threads)
+    except ValueError:
+        settings.gzip_threads = 0
+    if settings.gzip_threads < 1:
+        settings.logger.error("Option '--gzip-threads' must be a positive integer")
+        exit(1)
+
+    try:
+        codec.set_backend(args.json_backend)
+    except ValueError as e:
+        settings.logger.error("Option '--json-backend': {}".format(e))
+        exit(1)
+
     N = 0
     for file in args.files:
         N += 1
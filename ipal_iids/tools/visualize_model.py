@@ -1,20 +1,12 @@
 #!/usr/bin/env python3
 import argparse
-import gzip
 import json
 import logging
 import sys
 
 import ipal_iids.settings as settings
-from ids.utils import get_all_iidss
-
-
-# Wrapper for hiding .gz files
-def open_file(filename, mode):
-    if filename.endswith(".gz"):
-        return gzip.open(filename, mode=mode, compresslevel=settings.compresslevel)
-    else:
-        return open(filename, mode=mode, buffering=1)
+from ipal_iids.utils import open_file
+from ids.utils import get_ids
 
 
 # Initialize logger
@@ -82,7 +74,7 @@ def load_settings(args):
     idss = []
     for name, config in settings.idss.items():
         try:
-            idss.append(get_all_iidss()[config["_type"]](name=name))
+            idss.append(get_ids(config["_type"])(name=name))
         except TypeError:
             settings.logger.error(
                 "Failed loading model. Make sure you provide a config file, not a model file!"
@@ -1,6 +1,11 @@
 import gzip
+import io
+import os
 from pathlib import Path
+import queue
+import stat
 import sys
+import threading
 
 import ipal_iids.settings as settings
 
@@ -10,6 +15,11 @@ def open_file(filename, mode="r", **args):
     if filename is None:
         return None
     elif filename.endswith(".gz"):
+        args.setdefault("compresslevel", settings.compresslevel)
+        if settings.gzip_threads > 1:
+            from ipal_iids import pgzip
+
+            return pgzip.open(filename, mode, threads=settings.gzip_threads, **args)
         return gzip.open(filename, mode, **args)
     elif filename == "-":
         return sys.stdin
@@ -33,3 +43,95 @@ def filter_keys(dict, keys):
     """
     for unwanted in set(dict.keys()) - set(keys):
         del dict[unwanted]
+
+
+class FlushingWriter:
+    """
+    Write lines to an output file and flush it according to the configured
+    policy: every N messages (settings.flush_messages), at most T milliseconds
+    after a message was written (settings.flush_interval), or only on close if
+    neither is set. Closing the writer flushes it but leaves the file open.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.messages = settings.flush_messages
+        self.interval = settings.flush_interval
+
+        self._pending = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def write(self, line):
+        with self._lock:
+            self.fd.write(line)
+            self._pending += 1
+
+            if self.messages is not None and self._pending >= self.messages:
+                self._flush()
+            elif self.interval is not None and self._timer is None:
+                self._timer = threading.Timer(self.interval / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._pending > 0:
+            self.fd.flush()
+            self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+
+
+def is_stream(fd):
+    """
+    Whether reading from fd may block waiting for data, e.g., for pipes, sockets or
+    terminals. Regular and compressed files are not streams.
+    """
+    try:
+        return not stat.S_ISREG(os.fstat(fd.fileno()).st_mode)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+
+
+class LineReader:
+    """
+    Reads lines from a stream in a background thread, such that the caller can wait
+    for the next line with a timeout. readline returns None if no line arrived in
+    time and an empty string at the end of the stream.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self._lines = queue.Queue(maxsize=1024)
+        self._eof = False
+
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        while True:
+            line = self.fd.readline()
+            self._lines.put(line)
+            if not line:
+                break
+
+    def readline(self, timeout=None):
+        if self._eof:
+            return ""
+
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        self._eof = not line
+        return line
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Benchmark of the FeatureIDS feature extraction for a growing number of features.
+#
+# Usage: python3 misc/benchmarks/feature_extraction.py [--messages N]
+import argparse
+import random
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import ipal_iids.settings as settings  # noqa: E402
+from ids.utils import get_ids  # noqa: E402
+
+
+def generate_msgs(features, n):
+    msgs = []
+    for i in range(n):
+        state = {
+            "sensor{}".format(f): round(random.random() * 100, 3)
+            for f in range(features)
+        }
+        state["mode"] = random.choice(["auto", "manual"])
+        msgs.append({"timestamp": i, "type": 3, "state": state, "malicious": False})
+    return msgs
+
+
+def measure(extract, msgs):
+    start = time.perf_counter()
+    for msg in msgs:
+        extract(msg)
+    return len(msgs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("features  per-feature lookup [msgs/s]  compiled plan [msgs/s]  speedup")
+    for features in [10, 100, 1000]:
+        n = max(1000, args.messages * 10 // features)
+        msgs = generate_msgs(features, n)
+
+        settings.idss = {
+            "bench": {
+                "_type": "MinMax",
+                "features": ["state;sensor{}".format(f) for f in range(features)]
+                + ["state;mode", "type"],
+            }
+        }
+        ids = get_ids("MinMax")(name="bench")
+        ids.features = [f.split(";") for f in ids.settings["features"]]
+
+        assert ids._extract_features(msgs[0]) == [
+            ids._get_val(msgs[0], f) for f in ids.features
+        ]
+
+        legacy = measure(lambda msg: [ids._get_val(msg, f) for f in ids.features], msgs)
+        compiled = measure(ids._extract_features, msgs)
+
+        print(
+            "{:>8}  {:>27.0f}  {:>22.0f}  {:>6.1f}x".format(
+                features, legacy, compiled, compiled / legacy
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
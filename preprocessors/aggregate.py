@@ -31,6 +31,9 @@ class AggregatePreprocessor(Preprocessor):
         else:
             return None
 
+    def output_widths(self, widths):
+        return None  # Concatenates a varying number of events
+
     def reset(self):
         self.N = 0
         self.aggregate = []
@@ -0,0 +1,62 @@
+import numpy as np
+
+# Helpers for the batched preprocessor API. A batch of events is stored
+# column-wise: a list with one 2-D NumPy array per feature, with one row per
+# event and more than one column if a preprocessor expanded the feature, e.g.,
+# into a one-hot encoding. A second list holds a boolean array per feature that
+# marks None values. Float features are stored as float arrays, where None is
+# replaced with 0, all others as object arrays.
+
+
+def rows_to_columns(events, width):
+    if isinstance(events, np.ndarray) and events.dtype != object:
+        columns = [events[:, i : i + 1].astype(float) for i in range(width)]
+        masks = [np.zeros(len(events), dtype=bool) for _ in range(width)]
+        return columns, masks
+
+    columns = []
+    masks = []
+    for i in range(width):
+        values = [e[i] for e in events]
+        mask = np.array([v is None for v in values], dtype=bool)
+
+        if all(type(v) is float for v in values if v is not None):
+            column = np.array([0.0 if v is None else v for v in values], float)
+        else:
+            column = np.empty(len(values), dtype=object)
+            for j, v in enumerate(values):
+                column[j] = v
+
+        columns.append(column.reshape(-1, 1))
+        masks.append(mask)
+
+    return columns, masks
+
+
+def columns_to_rows(columns, masks):
+    # Per-row representation as used by the transform API
+    values = []
+    for column, mask in zip(columns, masks):
+        if column.shape[1] == 1:
+            value = [v[0] for v in column.tolist()]
+        else:
+            value = column.tolist()
+        values.append([None if m else v for v, m in zip(value, mask.tolist())])
+
+    return [list(row) for row in zip(*values)] if len(values) > 0 else []
+
+
+def flatten_columns(columns, masks):
+    # Returns a float matrix if possible, otherwise flat rows. Expanded features are
+    # already contiguous columns, thus rows do not need to be flattened recursively
+    X = np.hstack(columns)
+    if X.dtype != object and not any(m.any() for m in masks):
+        return X
+
+    X = X.astype(object)
+    start = 0
+    for column, mask in zip(columns, masks):
+        X[mask, start : start + column.shape[1]] = None
+        start += column.shape[1]
+
+    return X.tolist()
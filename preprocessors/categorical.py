@@ -1,6 +1,6 @@
 import numpy as np
 
-from typing import Any, Dict, Union, List
+from typing import Dict, Union, List
 
 import ipal_iids.settings as settings
 
@@ -11,12 +11,20 @@ class CategoricalPreprocessor(Preprocessor):
 
     _name = "categorical"
     _description = "Encode as categorical"
-    encoder: List[Union[Dict[str, Any], None]]
+    _supports_batch = True
+    classes: List[Union[List[str], None]]
+    codes: List[Union[Dict[str, int], None]]
 
     def __init__(self, features):
         super().__init__(features)
 
-        self.encoder = [None] * len(self.features)
+        # Categories (as strings) and their index within the one-hot encoding
+        self.classes = [None] * len(self.features)
+        self.codes = [None] * len(self.features)
+
+    def _compile(self, i, classes):
+        self.classes[i] = classes
+        self.codes[i] = {c: code for code, c in enumerate(classes)}
 
     def fit(self, values):
         if len(values[0]) != len(self.features):
@@ -26,9 +34,7 @@ class CategoricalPreprocessor(Preprocessor):
             if not self.features[i]:
                 continue
 
-            X = list(set([v[i] for v in values]))
-            classes = np.eye(len(X))
-            self.encoder[i] = {str(x): list(classes[X.index(x)]) for x in X}
+            self._compile(i, [str(x) for x in set([v[i] for v in values])])
 
     def transform(self, value):
         if len(value) != len(self.features):
@@ -39,22 +45,94 @@ class CategoricalPreprocessor(Preprocessor):
                 continue
 
             try:
-                value[i] = self.encoder[i][str(value[i])]
+                code = self.codes[i][str(value[i])]
             except KeyError:
                 settings.logger.critical(
                     "Value {} not in trained categories".format(value[i])
                 )
+                continue
+
+            value[i] = [0.0] * len(self.classes[i])
+            value[i][code] = 1.0
 
         return value
 
+    def _lookup(self, i, column, mask):
+        # Codes of a column, each distinct value is converted to a string only once
+        if column.dtype == object:
+            # Equal values of distinct types, e.g., 1 and True, have distinct strings
+            distinct = {}
+            try:
+                inverse = np.array(
+                    [distinct.setdefault((type(v), v), len(distinct)) for v in column],
+                    dtype=int,
+                )
+                values = [v for _, v in distinct]
+            except TypeError:  # Unhashable values, e.g., lists, are converted per row
+                values, inverse = column.tolist(), np.arange(len(column))
+        else:
+            values, inverse = np.unique(column, return_inverse=True)
+            values = values.tolist()
+
+        codes = np.array([self.codes[i].get(str(v), -1) for v in values], dtype=int)
+        codes = codes[inverse]
+        codes[mask] = self.codes[i].get("None", -1)
+
+        return codes
+
+    def transform_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        columns = list(columns)
+        masks = list(masks)
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            if columns[i].shape[1] > 1:
+                raise NotImplementedError
+
+            codes = self._lookup(i, columns[i][:, 0], masks[i])
+            if (codes < 0).any():  # Log unknown categories row by row
+                raise NotImplementedError
+
+            # Write the one-hot encoding into a preallocated matrix
+            onehot = np.zeros((len(codes), len(self.classes[i])))
+            onehot[np.arange(len(codes)), codes] = 1.0
+
+            columns[i] = onehot
+            masks[i] = np.zeros(len(codes), dtype=bool)
+
+        return columns, masks
+
+    def output_widths(self, widths):
+        return [
+            len(self.classes[i]) if self.features[i] else width
+            for i, width in enumerate(widths)
+        ]
+
     def reset(self):
         pass  # Nothing to reset
 
     def get_fitted_model(self):
-        return {"features": self.features, "encoder": self.encoder}
+        return {"features": self.features, "classes": self.classes}
 
     @classmethod
     def from_fitted_model(cls, model):
         categorical = CategoricalPreprocessor(model["features"])
-        categorical.encoder = model["encoder"]
+
+        for i in range(len(categorical.features)):
+            if not categorical.features[i]:
+                continue
+
+            if "classes" in model:
+                categorical._compile(i, model["classes"][i])
+            else:  # Models stored the one-hot encoding of each category before
+                width = len(next(iter(model["encoder"][i].values())))
+                classes = [None] * width
+                for category, onehot in model["encoder"][i].items():
+                    classes[int(np.argmax(onehot))] = category
+                categorical._compile(i, classes)
+
         return categorical
@@ -1,52 +1,76 @@
+import numpy as np
+
 from .preprocessor import Preprocessor
 
 
 class GradientPreprocessor(Preprocessor):
 
-    _name = "gradient"  # NOTE Does not consider time!
+    _name = "gradient"
     _description = "Calculate gradient"
+    _default_settings = {"window_size": 1, "timestamp": False}
 
-    def __init__(self, features, window_size=1):
+    def __init__(self, features, window_size=1, timestamp=False):
         super().__init__(features)
         self.window_size = window_size
 
-        self.last_value = [None] * len(self.features)
-        self.sliding_window = [[] for _ in range(len(self.features))]
+        # Divide by the time elapsed within the window instead of the number of
+        # messages, which does not require equidistant messages
+        self.timestamp = timestamp
+        self._requires_timestamp = timestamp
+
+        self._selected = [i for i in range(len(self.features)) if self.features[i]]
+        self.reset()
+
+    def reset(self):
+        # The mean of the last n differences telescopes to the difference between the
+        # current value and the value n messages ago. The last n + 1 values of all
+        # selected features are kept as rows of a ring buffer
+        self._values = np.zeros((self.window_size + 1, len(self._selected)))
+        self._timestamps = np.zeros(self.window_size + 1)
+        self._count = 0
 
     def fit(self, values):
         pass
 
-    def transform(self, value):
+    def transform(self, value, timestamp=None):
+        if len(self._selected) == 0:
+            return value
 
-        for i in range(len(self.features)):
-            if not self.features[i]:
-                continue
+        slot = self._count % (self._values.shape[0])
+        self._values[slot] = [value[i] for i in self._selected]
+        self._timestamps[slot] = timestamp if self.timestamp else 0
+        self._count += 1
 
-            out = None  # None if buffer not full yet
+        out = [None] * len(self._selected)  # None if buffer not full yet
 
-            if self.last_value[i] is not None:  # Skip if first value
+        if self._count > self.window_size:
+            oldest = self._count % (self._values.shape[0])
 
-                # calculate new gradient
-                self.sliding_window[i].append(value[i] - self.last_value[i])
+            if self.timestamp:
+                delta = self._timestamps[slot] - self._timestamps[oldest]
+            else:
+                delta = self.window_size
 
-                if len(self.sliding_window[i]) > self.window_size:
-                    self.sliding_window[i].pop(0)
-                if len(self.sliding_window[i]) == self.window_size:
-                    out = sum(self.sliding_window[i]) / self.window_size
+            if delta > 0:
+                out = ((self._values[slot] - self._values[oldest]) / delta).tolist()
 
-            self.last_value[i] = value[i]  # Save last value
-            value[i] = out  # set output
+        for i, gradient in zip(self._selected, out):
+            value[i] = gradient  # set output
 
         return value
 
-    def reset(self):
-        self.last_value = [None] * len(self.features)
-        self.sliding_window = [[] for _ in range(len(self.features))]
-
     def get_fitted_model(self):
-        return {"features": self.features, "window_size": self.window_size}
+        return {
+            "features": self.features,
+            "window_size": self.window_size,
+            "timestamp": self.timestamp,
+        }
 
     @classmethod
     def from_fitted_model(cls, model):
-        gradient = GradientPreprocessor(model["features"], model["window_size"])
+        gradient = GradientPreprocessor(
+            model["features"],
+            model["window_size"],
+            timestamp=model.get("timestamp", False),
+        )
         return gradient
@@ -1,3 +1,5 @@
+import numpy as np
+
 import ipal_iids.settings as settings
 from .preprocessor import Preprocessor
 
@@ -6,6 +8,7 @@ class IndicateNonePreprocessor(Preprocessor):
 
     _name = "indicate-none"
     _description = "Set None to 0 and indicate with new feature"
+    _supports_batch = True
 
     def __init__(self, features):
         super().__init__(features)
@@ -23,11 +26,39 @@ class IndicateNonePreprocessor(Preprocessor):
 
             if value[i] is None:
                 value[i] = [0, 1]
+            elif type(value[i]) is list:  # Keep expanded features flat
+                value[i] = value[i] + [0]
             else:
                 value[i] = [value[i], 0]
 
         return value
 
+    def transform_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        columns = list(columns)
+        masks = list(masks)
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            X, mask = columns[i], masks[i]
+            if X.shape[1] > 1 and mask.any():
+                raise NotImplementedError  # None replaces the whole expanded feature
+
+            X = np.where(mask[:, None], 0, X).astype(X.dtype)
+            columns[i] = np.hstack([X, mask[:, None].astype(int).astype(X.dtype)])
+            masks[i] = np.zeros(len(mask), dtype=bool)
+
+        return columns, masks
+
+    def output_widths(self, widths):
+        return [
+            (1 if width is None else width) + 1 if self.features[i] else width
+            for i, width in enumerate(widths)
+        ]
+
     def reset(self):
         pass  # Nothing to reset
 
@@ -1,5 +1,6 @@
-from typing import List, Optional
-from sklearn.preprocessing import LabelEncoder
+import numpy as np
+
+from typing import Any, Dict, List, Optional
 
 import ipal_iids.settings as settings
 
@@ -10,13 +11,44 @@ class LabelEncoderPreprocessor(Preprocessor):
 
     _name = "label"
     _description = "Encode as labels"
-    encoder: List[Optional[LabelEncoder]]
-    fitdata: List[Optional[List[set]]]
+    _default_settings = {"unknown": None}
+    _supports_batch = True
+    classes: List[Optional[List[Any]]]
+    codes: List[Optional[Dict[Any, float]]]
 
-    def __init__(self, features):
+    def __init__(self, features, unknown=None):
         super().__init__(features)
-        self.encoder = [None] * len(self.features)
-        self.fitdata = [None] * len(self.features)
+
+        # Code of values not seen during training. If None, they are kept as is
+        self.unknown = unknown
+
+        self.classes = [None] * len(self.features)  # Sorted classes per feature
+        self.codes = [None] * len(self.features)
+        self._numeric = [None] * len(self.features)  # Classes as array if all floats
+
+    def _compile(self, i, classes):
+        self.classes[i] = classes
+        self.codes[i] = {c: float(code) for code, c in enumerate(classes)}
+
+        if all(type(c) is float for c in classes):
+            self._numeric[i] = np.array(classes, dtype=float)
+
+    @staticmethod
+    def _sorted(classes):
+        try:
+            return sorted(classes)
+        except TypeError:  # e.g., strings and numbers, which are ordered by type first
+            return sorted(classes, key=lambda c: (type(c).__name__, c))
+
+    @staticmethod
+    def _legacy_sorted(classes):
+        # sklearn's LabelEncoder sorted the classes as numpy array, which compares
+        # mixed strings and numbers as strings, e.g., 1.0 < 10.0 < 2.0 < "a"
+        try:
+            order = np.argsort(np.array(classes), kind="stable")
+        except TypeError:
+            return LabelEncoderPreprocessor._sorted(classes)
+        return [classes[j] for j in order]
 
     def fit(self, values):
         if len(values[0]) != len(self.features):
@@ -26,9 +58,7 @@ class LabelEncoderPreprocessor(Preprocessor):
             if not self.features[i]:
                 continue
 
-            self.encoder[i] = LabelEncoder()
-            self.fitdata[i] = list(set([v[i] for v in values]))
-            self.encoder[i].fit(self.fitdata[i])
+            self._compile(i, self._sorted(set([v[i] for v in values])))
 
     def transform(self, value):
         if len(value) != len(self.features):
@@ -39,30 +69,78 @@ class LabelEncoderPreprocessor(Preprocessor):
                 continue
 
             try:
-                value[i] = float(self.encoder[i].transform([value[i]])[0])
-            except ValueError:
-                settings.logger.critical(
-                    "Value {} not in trained categories".format(value[i])
-                )
+                value[i] = self.codes[i][value[i]]
+            except KeyError:
+                if self.unknown is not None:
+                    value[i] = self.unknown
+                else:
+                    settings.logger.critical(
+                        "Value {} not in trained categories".format(value[i])
+                    )
 
         return value
 
+    def transform_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        columns = list(columns)
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            if columns[i].shape[1] > 1:
+                raise NotImplementedError
+
+            keep = ~masks[i]
+            values = columns[i][keep, 0]
+            column = np.zeros((len(keep), 1))
+
+            if values.dtype != object and self._numeric[i] is not None:
+                # Binary search within the sorted classes
+                classes = self._numeric[i]
+                codes = np.searchsorted(classes, values)
+                known = codes < len(classes)
+                known[known] = classes[codes[known]] == values[known]
+                codes = codes.astype(float)
+            else:
+                lookup = [self.codes[i].get(v) for v in values.tolist()]
+                known = np.array([c is not None for c in lookup], dtype=bool)
+                codes = np.array([0.0 if c is None else c for c in lookup])
+
+            if not known.all():
+                if self.unknown is None:  # Log unknown categories row by row
+                    raise NotImplementedError
+                codes[~known] = self.unknown
+
+            column[keep, 0] = codes
+            columns[i] = column
+
+        return columns, masks
+
     def reset(self):
         pass  # Nothing to reset
 
     def get_fitted_model(self):
-        return {"features": self.features, "fitdata": self.fitdata}
+        return {
+            "features": self.features,
+            "classes": self.classes,
+            "unknown": self.unknown,
+        }
 
     @classmethod
     def from_fitted_model(cls, model):
-        labelencoder = LabelEncoderPreprocessor(model["features"])
-        labelencoder.fitdata = model["fitdata"]
+        labelencoder = LabelEncoderPreprocessor(
+            model["features"], unknown=model.get("unknown")
+        )
 
         for i in range(len(labelencoder.features)):
             if not labelencoder.features[i]:
                 continue
 
-            labelencoder.encoder[i] = LabelEncoder()
-            labelencoder.encoder[i].fit(labelencoder.fitdata[i])
+            if "classes" in model:
+                labelencoder._compile(i, model["classes"][i])
+            else:  # Models stored the unsorted training values before
+                labelencoder._compile(i, cls._legacy_sorted(model["fitdata"][i]))
 
         return labelencoder
@@ -11,6 +11,7 @@ class MeanPreprocessor(Preprocessor):
 
     _name = "mean"
     _description = "Scale by mean-standard deviation"
+    _supports_batch = True
     means: List[float]
     stds: List[float]
 
@@ -27,17 +28,32 @@ class MeanPreprocessor(Preprocessor):
             if not self.features[i]:
                 continue
 
-            X = [v[i] for v in values if v[i] is not None]
-            self.means[i] = float(np.mean(X))
-            self.stds[i] = float(np.std(X))
+            self._fit_feature(i, [v[i] for v in values if v[i] is not None])
 
-            if self.stds[i] == 0:
-                settings.logger.info(
-                    "Standard deviation is zero. Adjusting values of {} to std 1.0".format(
-                        i
-                    )
+    def fit_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        if self._has_objects(columns):
+            return super().fit_batch(columns, masks)
+
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            self._fit_feature(i, columns[i][~masks[i]])
+
+    def _fit_feature(self, i, X):
+        self.means[i] = float(np.mean(X))
+        self.stds[i] = float(np.std(X))
+
+        if self.stds[i] == 0:
+            settings.logger.info(
+                "Standard deviation is zero. Adjusting values of {} to std 1.0".format(
+                    i
                 )
-                self.stds[i] = 1
+            )
+            self.stds[i] = 1
 
     def transform(self, value):
         if len(value) != len(self.features):
@@ -51,6 +67,22 @@ class MeanPreprocessor(Preprocessor):
 
         return value
 
+    def transform_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        if self._has_objects(columns):
+            raise NotImplementedError
+
+        columns = list(columns)
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            columns[i] = (columns[i] - self.means[i]) / self.stds[i]
+
+        return columns, masks
+
     def reset(self):
         pass  # Nothing to reset
 
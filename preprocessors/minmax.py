@@ -11,6 +11,7 @@ class MinMaxPreprocessor(Preprocessor):
 
     _name = "minmax"
     _description = "Scale by mininum and maximum"
+    _supports_batch = True
     mins: List[float]
     maxs: List[float]
 
@@ -27,20 +28,33 @@ class MinMaxPreprocessor(Preprocessor):
             if not self.features[i]:
                 continue
 
-            X = [v[i] for v in values if v[i] is not None]
-            self.mins[i] = float(np.min(X))
-            self.maxs[i] = float(np.max(X))
+            self._fit_feature(i, [v[i] for v in values if v[i] is not None])
 
-            if self.mins[i] == self.maxs[i]:
-                settings.logger.info(
-                    "Min Max is the same. Adjusting values of feature {} to 0.5".format(
-                        i
-                    )
-                )
-                self.mins[i] -= 1
-                self.maxs[i] += 1
+    def fit_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        if self._has_objects(columns):
+            return super().fit_batch(columns, masks)
 
-            assert self.maxs[i] - self.mins[i] > 0
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            self._fit_feature(i, columns[i][~masks[i]])
+
+    def _fit_feature(self, i, X):
+        self.mins[i] = float(np.min(X))
+        self.maxs[i] = float(np.max(X))
+
+        if self.mins[i] == self.maxs[i]:
+            settings.logger.info(
+                "Min Max is the same. Adjusting values of feature {} to 0.5".format(i)
+            )
+            self.mins[i] -= 1
+            self.maxs[i] += 1
+
+        assert self.maxs[i] - self.mins[i] > 0
 
     def transform(self, value):
         if len(value) != len(self.features):
@@ -61,6 +75,31 @@ class MinMaxPreprocessor(Preprocessor):
 
         return value
 
+    def transform_batch(self, columns, masks):
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        if self._has_objects(columns):
+            raise NotImplementedError
+
+        columns = list(columns)
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            X = columns[i]
+            outside = ~masks[i] & ((X < self.mins[i]) | (self.maxs[i] < X)).any(axis=1)
+            for value in X[outside, 0]:
+                settings.logger.warning(
+                    "Value {} out of trained range ({} - {})".format(
+                        value, self.mins[i], self.maxs[i]
+                    )
+                )
+
+            columns[i] = (X - self.mins[i]) / (self.maxs[i] - self.mins[i])
+
+        return columns, masks
+
     def reset(self):
         pass  # Nothing to reset
 
@@ -1,6 +1,5 @@
-import joblib
-import os
-import random
+import io
+import numpy as np
 
 from sklearn.decomposition import PCA
 
@@ -13,53 +12,94 @@ class PCAPreprocessor(Preprocessor):
 
     _name = "pca"
     _description = "Performs a principal component analysis"
+    _supports_batch = True
 
     def __init__(self, features):
         super().__init__(features)
-        self.encoder = None
+
+        # Projection of the fitted PCA: (x - mean) @ components.T / scale
+        self.components = None
+        self.mean = None
+        self.scale = None  # Only if the components are whitened
+
+    def _compile(self, encoder):
+        self.components = np.asarray(encoder.components_, dtype=float)
+        self.mean = np.asarray(encoder.mean_, dtype=float)
+        if encoder.whiten:
+            self.scale = np.sqrt(np.asarray(encoder.explained_variance_, dtype=float))
+
+    def _project(self, X):
+        X = (X - self.mean) @ self.components.T
+        if self.scale is not None:
+            X /= self.scale
+        return X
 
     def fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
-        self.encoder = PCA()
-        self.encoder.fit(values)
+        self._compile(PCA().fit(values))
+
+    def fit_batch(self, columns, masks):
+        if not self._is_matrix(columns, masks):
+            return super().fit_batch(columns, masks)
+
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        self._compile(PCA().fit(np.hstack(columns)))
 
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
-        return self.encoder.transform([value])[0]
+        return self._project(np.asarray(value, dtype=float))
 
-    def reset(self):
-        pass  # Nothing to reset
+    def transform_batch(self, columns, masks):
+        if not self._is_matrix(columns, masks):
+            raise NotImplementedError
 
-    def get_fitted_model(self):
-        # Save model to temprary file
-        tmp = ".tmp-{}".format(random.randint(1000, 9999))
-        joblib.dump(self.encoder, tmp, compress=3)
+        if len(columns) != len(self.features):
+            settings.logger.critical("Feature length does not match data length!")
+
+        X = self._project(np.hstack(columns))
+        return (
+            [X[:, j : j + 1] for j in range(X.shape[1])],
+            [np.zeros(len(X), dtype=bool)] * X.shape[1],
+        )
 
-        # Load file to string
-        with open(tmp, "rb") as f:
-            model = list(f.read())
+    def _is_matrix(self, columns, masks):
+        # PCA operates on the whole event, which has to be a plain float matrix
+        return all(c.dtype != object and c.shape[1] == 1 for c in columns) and not any(
+            m.any() for m in masks
+        )
 
-        # Remove temporary file
-        os.remove(tmp)
+    def output_widths(self, widths):
+        return [None] * len(self.components)
 
-        return {"features": self.features, "model": model}
+    def reset(self):
+        pass  # Nothing to reset
+
+    def get_fitted_model(self):
+        return {
+            "features": self.features,
+            "components": self.components.tolist(),
+            "mean": self.mean.tolist(),
+            "scale": None if self.scale is None else self.scale.tolist(),
+        }
 
     @classmethod
     def from_fitted_model(cls, model):
-        # Save model to temporary file
-        tmp = ".tmp-{}".format(random.randint(1000, 9999))
-        with open(tmp, "wb") as f:
-            f.write(bytes(model["model"]))
-
-        # Load model
         pca = PCAPreprocessor(model["features"])
-        pca.encoder = joblib.load(tmp)
 
-        # Remove temprary file
-        os.remove(tmp)
+        if "components" in model:
+            pca.components = np.array(model["components"], dtype=float)
+            pca.mean = np.array(model["mean"], dtype=float)
+            if model["scale"] is not None:
+                pca.scale = np.array(model["scale"], dtype=float)
+        else:  # Models stored the bytes of the joblib-dumped sklearn PCA before
+            import joblib
+
+            pca._compile(joblib.load(io.BytesIO(bytes(model["model"]))))
 
         return pca
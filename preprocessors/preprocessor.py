@@ -1,11 +1,15 @@
 from typing import List
 
+from .batch import columns_to_rows
+
 
 class Preprocessor:
 
     _name = None
     _description = ""
-    _default_settings = {}
+    _default_settings = {}  # Further options of the preprocessor and their defaults
+    _supports_batch = False
+    _requires_timestamp = False  # transform additionally takes the event's timestamp
 
     features: List[bool]
 
@@ -19,6 +23,29 @@ class Preprocessor:
     def transform(self, values):
         raise NotImplementedError
 
+    # Batched variants of fit and transform operating on all events at once, see
+    # preprocessors/batch.py for the column-wise data layout. Preprocessors that set
+    # _supports_batch implement transform_batch, which returns the transformed
+    # columns and masks. It raises NotImplementedError if a batch has to be
+    # processed row by row instead, e.g., for values not seen during training.
+    def fit_batch(self, columns, masks):
+        self.fit(columns_to_rows(columns, masks))
+
+    def transform_batch(self, columns, masks):
+        raise NotImplementedError
+
+    # Widths of the transformed features given the widths of the input features. None
+    # denotes a single value and an integer a flat list of values of that length.
+    # Returns None if the output has no fixed layout, e.g., if events are aggregated
+    def output_widths(self, widths):
+        return widths
+
+    def _has_objects(self, columns):
+        # Whether any of the selected features is non-numeric
+        return any(
+            c.dtype == object for c, apply in zip(columns, self.features) if apply
+        )
+
     def get_fitted_model(self):
         raise NotImplementedError
 
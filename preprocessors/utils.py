@@ -1,23 +1,23 @@
-from .aggregate import AggregatePreprocessor
-from .categorical import CategoricalPreprocessor
-from .gradient import GradientPreprocessor
-from .indicatenone import IndicateNonePreprocessor
-from .labelencoder import LabelEncoderPreprocessor
-from .mean import MeanPreprocessor
-from .minmax import MinMaxPreprocessor
-from .pca import PCAPreprocessor
+import importlib
 
-preprocessors = [
-    AggregatePreprocessor,
-    CategoricalPreprocessor,
-    GradientPreprocessor,
-    IndicateNonePreprocessor,
-    LabelEncoderPreprocessor,
-    MeanPreprocessor,
-    MinMaxPreprocessor,
-    PCAPreprocessor,
-]
+# Preprocessors are imported lazily, i.e., only if a config references them,
+# since some of them depend on sklearn.
+preprocessors = {
+    "aggregate": "preprocessors.aggregate.AggregatePreprocessor",
+    "categorical": "preprocessors.categorical.CategoricalPreprocessor",
+    "gradient": "preprocessors.gradient.GradientPreprocessor",
+    "indicate-none": "preprocessors.indicatenone.IndicateNonePreprocessor",
+    "label": "preprocessors.labelencoder.LabelEncoderPreprocessor",
+    "mean": "preprocessors.mean.MeanPreprocessor",
+    "minmax": "preprocessors.minmax.MinMaxPreprocessor",
+    "pca": "preprocessors.pca.PCAPreprocessor",
+}
+
+
+def get_preprocessor(name):
+    module, cls = preprocessors[name].rsplit(".", 1)
+    return getattr(importlib.import_module(module), cls)
 
 
 def get_all_preprocessors():
-    return {preprocessor._name: preprocessor for preprocessor in preprocessors}
+    return {name: get_preprocessor(name) for name in preprocessors}
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import ipal_iids.codec as codec
+
+MSGS = [
+    '{"timestamp": 1.5, "src": "192.168.0.1:502", "data": {"1": 7, "2": -0.1}, "malicious": false}',
+    '{"timestamp": 2, "data": {"a": "\\u00e4\\ud83d\\ude00", "b": null}, "alerts": {}}',
+    '{"timestamp": 3, "data": {"nan": NaN, "inf": Infinity, "big": 123456789012345678901234567890}}',
+    '{"timestamp": 4, "data": {"x": 1e-07, "y": 1e+300, "z": [1, [2.5, true]]}}',
+]
+
+
+@pytest.fixture(params=codec.backends)
+def backend(request):
+    if request.param == "orjson" and codec.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    codec.set_backend(request.param)
+    yield request.param
+    codec.set_backend("auto")
+
+
+@pytest.mark.parametrize("line", MSGS)
+def test_codec_loads(backend, line):
+    assert repr(codec.loads(line)) == repr(json.loads(line))
+
+
+@pytest.mark.parametrize("line", MSGS)
+def test_codec_dumps(backend, line):
+    msg = json.loads(line)
+
+    if backend == "orjson":  # compact output
+        assert repr(json.loads(codec.dumps(msg))) == repr(msg)
+    else:  # byte-identical to the standard library
+        assert codec.dumps(msg) == json.dumps(msg)
+
+
+def test_codec_dumps_non_finite(backend):
+    np = pytest.importorskip("numpy")
+    msg = {"data": {"a": float("nan"), "b": [np.float64("-inf"), None]}}
+
+    assert repr(json.loads(codec.dumps(msg))) == repr(
+        {"data": {"a": float("nan"), "b": [float("-inf"), None]}}
+    )
+
+
+def test_codec_unknown_backend():
+    with pytest.raises(ValueError):
+        codec.set_backend("unknown")
@@ -0,0 +1,19 @@
+import pytest
+
+from ids.featureplan import FeaturePlan
+
+MSG = {"type": 3, "state": {"a": 1.5, "b": "x", "c": None}, "data": {"a": [1, 2]}}
+
+
+def test_featureplan_lookup():
+    features = [["state", "b"], ["type"], ["state", "a"], ["data", "a"], ["state", "c"]]
+    plan = FeaturePlan(features)
+
+    assert not plan.hash
+    assert plan.lookup(MSG) == ["x", 3, 1.5, [1, 2], None]
+
+
+@pytest.mark.parametrize("feature", [["state", "d"], ["data", "a", "b"], ["missing"]])
+def test_featureplan_missing(feature):
+    with pytest.raises((KeyError, IndexError, TypeError)):
+        FeaturePlan([["type"], feature]).lookup(MSG)
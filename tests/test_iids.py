@@ -1,3 +1,4 @@
+import json
 import pytest
 
 from .conftest import metaids
@@ -23,3 +24,29 @@ def test_get_default_config(idsname):
         stdout.decode("utf-8").replace("\n", ""),
         test_get_default_config.__name__,
     )
+
+
+def test_classifier_both_training_inputs(tmp_path):
+    # Rejected before the training files are read, i.e., even if they do not exist
+    msg = {"timestamp": 0, "malicious": False, "state": {"a": 1}}
+    (tmp_path / "train.ipal").write_text(json.dumps(msg) + "\n")
+    (tmp_path / "dt.config").write_text(
+        json.dumps({"DT": {"_type": "DecisionTree", "features": ["state;a"]}})
+    )
+
+    errno, stdout, stderr = metaids(
+        [
+            "--retrain",
+            "--train.ipal",
+            str(tmp_path / "train.ipal"),
+            "--train.state",
+            str(tmp_path / "missing.ipal"),
+            "--live.ipal",
+            str(tmp_path / "train.ipal"),
+            "--config",
+            str(tmp_path / "dt.config"),
+        ]
+    )
+    assert errno == 1
+    assert b"ERROR:ipal-iids:Only state or message supported\n" in stderr
+    assert b"Traceback" not in stderr
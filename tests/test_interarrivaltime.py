@@ -0,0 +1,132 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import ipal_iids.settings as settings
+from ids.utils import get_ids
+
+from ids.interarrivaltime.identifier import IdentifierCache, get_identifier_cache
+from ids.interarrivaltime.window import ArrivalWindows, WindowExtrema
+
+
+def test_arrival_windows():
+    random.seed(0)
+    W = 5
+    windows = ArrivalWindows(W)
+    extrema = {}
+    history = {}
+
+    for identifier in ["a", "b", "c"]:
+        windows.add(identifier)
+        extrema[identifier] = WindowExtrema(W - 1)
+        history[identifier] = []
+
+    timestamp = 0.0
+    for _ in range(500):
+        identifier = random.choice(["a", "b", "c"])
+        timestamp += random.random()
+
+        _, previous, oldest = windows.push(identifier, timestamp)
+        history[identifier].append(timestamp)
+        window = history[identifier][-W:]
+
+        assert previous == (window[-2] if len(window) > 1 else None)
+        if previous is not None:
+            extrema[identifier].push(timestamp - previous)
+
+        if len(window) < W:
+            assert oldest is None
+            continue
+
+        assert oldest == window[0]
+        interevents = np.diff(window)
+        assert np.isclose((timestamp - oldest) / (W - 1), np.mean(interevents))
+        assert extrema[identifier].range() == np.max(interevents) - np.min(interevents)
+
+
+@pytest.mark.parametrize("idsname", ["inter-arrival-mean", "inter-arrival-range"])
+def test_single_message_window(idsname):
+    settings.idss = {"T": {"_type": idsname, "W": 1}}
+    ids = get_ids(idsname)(name="T")
+
+    msgs = [
+        {
+            "timestamp": float(i),
+            "src": "1.1.1.1:1",
+            "dest": "2.2.2.2:502",
+            "activity": "interrogate",
+            "type": 3,
+            "data": {"a": i},
+        }
+        for i in range(10)
+    ]
+    for msg in msgs:
+        ids.new_train_msg(msg)
+    ids.train()
+
+    for msg in msgs:
+        alert, metric = ids.new_ipal_msg(msg)
+        assert alert is False and math.isnan(metric)
+
+    assert math.isnan(WindowExtrema(3).range())
+
+
+def test_identifier_cache():
+    cache = IdentifierCache(2)
+    msgs = [
+        {
+            "src": "1.1.1.{}:{}".format(i % 3, 1000 + i % 5),
+            "dest": "2.2.2.2:502",
+            "activity": "interrogate",
+            "type": 3,
+            "data": {"a": 1, "b": 2} if i % 2 else {"b": 2},
+        }
+        for i in range(50)
+    ]
+
+    for msg in msgs:
+        expected = "-".join(
+            [msg["src"].split(":")[0], "2.2.2.2", "interrogate", "3"]
+            + list(msg["data"])
+        )
+        assert cache.name(msg) == expected
+
+    assert len(cache._cache) == 2
+    assert cache.hits + cache.misses == 50
+
+    # Only identifiers of trained models are interned to ids
+    assert cache.lookup(msgs[0]) == IdentifierCache.UNKNOWN
+    identifier = cache.intern(cache.name(msgs[0]))
+    assert cache.lookup(msgs[0]) == identifier
+    assert cache.names == [cache.name(msgs[0])]
+
+    # Messages of the same hosts share a cache entry regardless of their ports
+    cache = IdentifierCache(1)
+    for msg in msgs:
+        cache.lookup(dict(msg, src="1.1.1.1:{}".format(msg["src"][-4:]), data={}))
+    assert cache.misses == 1
+    assert get_identifier_cache() is get_identifier_cache()
+
+
+def test_identifier_cache_types():
+    # Equal message types of different Python types have distinct identifiers
+    cache = IdentifierCache(16)
+    msg = {"src": "1.1.1.1:1", "dest": "2.2.2.2:502", "activity": "x", "data": {}}
+
+    names = [cache.name(dict(msg, type=t)) for t in [1, 1.0, True, 1]]
+    assert [name.split("-")[-1] for name in names] == ["1", "1.0", "True", "1"]
+
+
+def test_identifier_cache_unknown():
+    # New event types during the live phase do not grow the identifier table
+    cache = IdentifierCache(16)
+    msg = {"src": "1.1.1.1:1", "dest": "2.2.2.2:502", "activity": "x", "type": 3}
+    cache.intern(cache.name(dict(msg, data={"a": 1})))
+
+    for i in range(10000):
+        assert cache.lookup(dict(msg, data={str(i): 1})) == IdentifierCache.UNKNOWN
+
+    assert len(cache.names) == len(cache.ids) == 1
+    assert len(cache._cache) == 16
@@ -0,0 +1,198 @@
+import gzip
+import json
+import os
+import random
+import select
+import subprocess
+
+import pytest
+
+from .conftest import METAIDS, metaids
+
+CONFIG = {
+    "MinMax": {"_type": "MinMax", "features": ["state;level"]},
+    "Histogram": {"_type": "Histogram", "features": ["state;switch"]},
+    "Steadytime": {"_type": "Steadytime", "features": ["state;switch"]},
+    "Mean": {"_type": "inter-arrival-mean"},
+    "Range": {"_type": "inter-arrival-range"},
+}
+
+
+def write_dataset(path, n, seed):
+    random.seed(seed)
+    timestamp = 100.0
+
+    with open(path, "w") as f:
+        for i in range(n):
+            timestamp += random.choice([1, 1, 1, 2]) * 0.5
+            switch = (i // 7) % 2
+            level = round(50 + 10 * random.random(), 3)
+            msgtype = random.choice([1, 3])
+
+            msg = {
+                "id": i,
+                "timestamp": timestamp,
+                "protocol": "modbus",
+                "malicious": False,
+                "src": "1.1.1.{}:1".format(random.choice([1, 2])),
+                "dest": "2.2.2.2:502:1",
+                "length": 12,
+                "type": msgtype,
+                "activity": "interrogate",
+                "data": {"switch": switch, "level": level},
+                "state": {"switch": switch, "level": level},
+            }
+            f.write(json.dumps(msg) + "\n")
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    path = tmp_path_factory.mktemp("parallel")
+    write_dataset(path / "train.ipal", 2000, 0)
+    write_dataset(path / "test.ipal", 1000, 1)
+    with open(path / "parallel.config", "w") as f:
+        json.dump(CONFIG, f)
+    return path
+
+
+def run(dataset, *args):
+    errno, stdout, stderr = metaids(
+        [
+            "--retrain",
+            "--train.ipal",
+            str(dataset / "train.ipal"),
+            "--train.state",
+            str(dataset / "train.ipal"),
+            "--live.ipal",
+            str(dataset / "test.ipal"),
+            "--config",
+            str(dataset / "parallel.config"),
+            "--output",
+            "-",
+        ]
+        + list(args)
+    )
+    assert errno == 0, stderr.decode()
+
+    msgs = [json.loads(line) for line in stdout.decode().splitlines()]
+    for msg in msgs:
+        msg.pop("_iids-config", None)
+    return msgs
+
+
+@pytest.mark.parametrize("batch_size", [1, 32])
+def test_live_workers(dataset, batch_size):
+    sequential = run(dataset)
+    parallel = run(dataset, "--live-workers", "3", "--batch-size", str(batch_size))
+
+    assert len(sequential) == 1000
+    assert parallel == sequential
+
+
+def test_train_workers(dataset):
+    sequential = run(dataset)
+    parallel = run(dataset, "--train-workers", "3", "--train-cpus", "1")
+
+    assert parallel == sequential
+
+
+@pytest.mark.parametrize("live_workers", [1, 2])
+def test_shards(dataset, live_workers):
+    sequential = run(dataset)
+    sharded = run(
+        dataset,
+        "--shards",
+        "3",
+        "--shard-warmup",
+        "200",
+        "--live-workers",
+        str(live_workers),
+    )
+
+    assert sharded == sequential
+
+
+def test_shards_gzip_threads(dataset, tmp_path):
+    # Shards must not inherit the pgzip threads of the main process
+    sequential = run(dataset)
+
+    with open(dataset / "test.ipal", "rb") as f:
+        with gzip.open(tmp_path / "test.ipal.gz", "wb") as g:
+            g.write(f.read())
+
+    errno, _, stderr = metaids(
+        [
+            "--retrain",
+            "--train.ipal",
+            str(dataset / "train.ipal"),
+            "--train.state",
+            str(dataset / "train.ipal"),
+            "--live.ipal",
+            str(tmp_path / "test.ipal.gz"),
+            "--config",
+            str(dataset / "parallel.config"),
+            "--output",
+            str(tmp_path / "output.ipal.gz"),
+            "--shards",
+            "3",
+            "--shard-warmup",
+            "200",
+            "--gzip-threads",
+            "4",
+        ]
+    )
+    assert errno == 0, stderr.decode()
+
+    with gzip.open(tmp_path / "output.ipal.gz", "rt") as f:
+        sharded = [json.loads(line) for line in f]
+    for msg in sharded:
+        msg.pop("_iids-config", None)
+
+    assert sharded == sequential
+
+
+def test_batch_latency_idle_input(dataset):
+    # A partial batch is processed once its latency passed although the input stays open
+    p = subprocess.Popen(
+        [
+            METAIDS,
+            "--retrain",
+            "--train.ipal",
+            str(dataset / "train.ipal"),
+            "--train.state",
+            str(dataset / "train.ipal"),
+            "--live.ipal",
+            "-",
+            "--config",
+            str(dataset / "parallel.config"),
+            "--output",
+            "-",
+            "--batch-size",
+            "1000",
+            "--batch-latency",
+            "100",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        with open(dataset / "test.ipal", "rb") as f:
+            lines = f.readlines()[:10]
+        p.stdin.write(b"".join(lines))
+        p.stdin.flush()
+
+        output = b""
+        while output.count(b"\n") < len(lines):
+            assert select.select([p.stdout], [], [], 30)[0], "batch was not processed"
+            output += os.read(p.stdout.fileno(), 1 << 16)
+
+        assert [json.loads(line)["id"] for line in output.splitlines()] == list(
+            range(10)
+        )
+    finally:
+        p.stdin.close()
+        p.wait()
+
+    assert p.returncode == 0
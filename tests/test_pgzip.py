@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from ipal_iids import pgzip
+
+CONTENT = "".join(
+    '{"timestamp": %d, "data": {"value": %d}}\n' % (i, i * 7 % 13) for i in range(50000)
+)
+
+
+@pytest.mark.parametrize("compresslevel", [0, 1, 9])
+@pytest.mark.parametrize("threads", [1, 4])
+def test_pgzip_write(tmp_path, compresslevel, threads):
+    path = tmp_path / "out.ipal.gz"
+
+    with pgzip.open(path, "wt", compresslevel=compresslevel, threads=threads) as f:
+        for line in CONTENT.splitlines(keepends=True):
+            f.write(line)
+            if line.startswith('{"timestamp": 10,'):
+                f.flush()  # flushing in between must not break the stream
+
+    with gzip.open(path, "rt") as f:
+        assert f.read() == CONTENT
+
+
+def test_pgzip_flush_every_line(tmp_path):
+    # Flushing after every message must not compress each message on its own
+    path = tmp_path / "out.ipal.gz"
+
+    with pgzip.open(path, "wt", threads=4) as f:
+        for line in CONTENT.splitlines(keepends=True):
+            f.write(line)
+            f.flush()
+
+    with gzip.open(path, "rt") as f:
+        assert f.read() == CONTENT
+    assert path.stat().st_size < 1.5 * len(gzip.compress(CONTENT.encode()))
+
+
+def test_pgzip_read(tmp_path):
+    path = tmp_path / "in.ipal.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(CONTENT)
+
+    with pgzip.open(path, "rt") as f:
+        assert f.read() == CONTENT
+
+    with pgzip.open(path, "r") as f:
+        assert f.readline() == CONTENT.splitlines(keepends=True)[0].encode()
+
+
+def test_pgzip_empty(tmp_path):
+    path = tmp_path / "empty.ipal.gz"
+    with pgzip.open(path, "wt"):
+        pass
+
+    with gzip.open(path, "rt") as f:
+        assert f.read() == ""
@@ -0,0 +1,263 @@
+import copy
+import io
+import joblib
+import random
+
+import numpy as np
+import pytest
+
+from sklearn.decomposition import PCA
+
+import ipal_iids.settings as settings
+from ids.simple.minmax import MinMax
+from preprocessors.batch import flatten_columns, rows_to_columns
+from preprocessors.utils import get_preprocessor
+
+
+def generate_events(n, seed):
+    random.seed(seed)
+    return [
+        [
+            round(random.random() * 100, 3),
+            random.choice([None, 1.0, 2.0]),
+            random.choice(["auto", "manual"]),
+        ]
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize(
+    "method,features",
+    [
+        ("minmax", [True, False, False]),
+        ("mean", [True, False, False]),
+        ("indicate-none", [False, True, False]),
+        ("categorical", [False, True, True]),
+        ("label", [False, False, True]),
+    ],
+)
+def test_batch_equals_rows(method, features):
+    events = generate_events(500, 0)
+
+    rows = get_preprocessor(method)(features)
+    rows.fit(copy.deepcopy(events))
+    expected = [rows.transform(e) for e in copy.deepcopy(events)]
+
+    batch = get_preprocessor(method)(features)
+    columns, masks = rows_to_columns(events, len(features))
+    batch.fit_batch(columns, masks)
+    columns, masks = batch.transform_batch(columns, masks)
+
+    # Equal results on new data
+    live = generate_events(100, 1)
+    expected_live = [rows.transform(e) for e in copy.deepcopy(live)]
+    live_columns, live_masks = batch.transform_batch(*rows_to_columns(live, 3))
+
+    for result, reference in [
+        (flatten_columns(columns, masks), expected),
+        (flatten_columns(live_columns, live_masks), expected_live),
+    ]:
+        assert len(result) == len(reference)
+        for a, b in zip(result, reference):
+            assert list(a) == list(flatten(b))
+
+
+def flatten(values):
+    for v in values:
+        if isinstance(v, list):
+            yield from flatten(v)
+        else:
+            yield v
+
+
+def test_categorical_mixed_types():
+    # Deduplicating a column keeps equal values of distinct types apart
+    values = ["a", 1, True, 1.0, "a", True]
+    pre = get_preprocessor("categorical")([True])
+    pre._compile(0, ["a", "1", "True", "1.0"])
+
+    columns, masks = rows_to_columns([[v] for v in values], 1)
+    assert columns[0].dtype == object
+    codes = pre._lookup(0, columns[0][:, 0], masks[0])
+    assert codes.tolist() == [pre.codes[0][str(v)] for v in values]
+    assert len(set(codes.tolist())) == 4
+
+
+def test_batch_unknown_category():
+    pre = get_preprocessor("categorical")([True])
+    pre.fit([["a"], ["b"]])
+
+    with pytest.raises(NotImplementedError):
+        pre.transform_batch(*rows_to_columns([["a"], ["c"]], 1))
+
+
+def test_label_unknown():
+    pre = get_preprocessor("label")([True, True], unknown=-1)
+    pre.fit([["a", 1.0], ["b", 2.0], ["a", 3.0]])
+
+    assert pre.transform(["b", 3.0]) == [1.0, 2.0]
+    assert pre.transform(["c", 4.0]) == [-1, -1]
+
+    columns, masks = pre.transform_batch(
+        *rows_to_columns([["b", 3.0], ["c", 4.0], ["a", 0.5]], 2)
+    )
+    assert flatten_columns(columns, masks).tolist() == [
+        [1.0, 2.0],
+        [-1.0, -1.0],
+        [0.0, -1.0],
+    ]
+
+    # Restored without refitting
+    restored = get_preprocessor("label").from_fitted_model(pre.get_fitted_model())
+    assert restored.codes == pre.codes
+    assert restored.transform(["c", 2.0]) == [-1, 1.0]
+
+
+def test_label_mixed():
+    pre = get_preprocessor("label")([True])
+    pre.fit([["a"], [2.0], [1.0], ["a"]])
+
+    assert pre.classes == [[1.0, 2.0, "a"]]
+    assert [pre.transform([v])[0] for v in [1.0, 2.0, "a"]] == [0.0, 1.0, 2.0]
+
+    columns, masks = pre.transform_batch(*rows_to_columns([["a"], [1.0]], 1))
+    assert flatten_columns(columns, masks).tolist() == [[2.0], [0.0]]
+
+
+def test_label_legacy_mixed():
+    # Models of sklearn's LabelEncoder keep the codes it assigned to mixed classes
+    legacy = {"features": [True], "fitdata": [["a", 2.0, 1.0, 10.0, 9.0]]}
+    pre = get_preprocessor("label").from_fitted_model(legacy)
+
+    assert pre.classes == [[1.0, 10.0, 2.0, 9.0, "a"]]
+    codes = [pre.transform([v])[0] for v in [1.0, 2.0, 9.0, 10.0, "a"]]
+    assert codes == [0.0, 2.0, 3.0, 1.0, 4.0]
+
+    # Saving the model again keeps the order
+    restored = get_preprocessor("label").from_fitted_model(pre.get_fitted_model())
+    assert restored.classes == pre.classes
+
+
+def test_preprocessor_options():
+    settings.idss = {
+        "F": {
+            "_type": "MinMax",
+            "features": ["a", "b"],
+            "preprocessors": [
+                {"method": "label", "features": ["a"], "unknown": -1, "note": "x"},
+                {"method": "minmax", "features": ["b"], "comment": "stale"},
+            ],
+        }
+    }
+    ids = MinMax(name="F")
+    ids._start_training()
+
+    assert ids.preprocessors[0].unknown == -1
+
+
+def test_categorical_model():
+    pre = get_preprocessor("categorical")([True, False])
+    pre.fit([["a", 1.0], ["b", 2.0], [None, 3.0]])
+
+    # Models with the previous one-hot encoding format
+    eye = np.eye(3).tolist()
+    legacy = {
+        "features": [True, False],
+        "encoder": [{c: eye[k] for k, c in enumerate(pre.classes[0])}, None],
+    }
+
+    for model in [pre.get_fitted_model(), legacy]:
+        restored = get_preprocessor("categorical").from_fitted_model(model)
+        assert restored.codes == pre.codes
+        assert restored.transform(["b", 1.0]) == pre.transform(["b", 1.0])
+
+
+@pytest.mark.parametrize(
+    "preprocessors",
+    [
+        [],
+        [{"method": "categorical", "features": ["b", "c"]}],
+        [
+            {"method": "categorical", "features": ["c"]},
+            {"method": "indicate-none", "features": ["b", "c"]},
+        ],
+        [{"method": "aggregate", "features": []}],
+    ],
+)
+def test_output_layout(preprocessors):
+    settings.idss = {
+        "F": {
+            "_type": "MinMax",
+            "features": ["a", "b", "c"],
+            "preprocessors": preprocessors,
+        }
+    }
+    ids = MinMax(name="F")
+    ids._start_training()
+
+    events = generate_events(50, 2)
+    for pre in ids.preprocessors:
+        pre.fit(copy.deepcopy(events))
+    ids._layout = ids._compute_layout()
+    assert (ids._layout is None) == any(
+        p["method"] == "aggregate" for p in preprocessors
+    )
+
+    for event in events:
+        state = ids._transform_state(copy.deepcopy(event))
+        if state is not None:
+            reference = copy.deepcopy(event)
+            for pre in ids.preprocessors:
+                reference = pre.transform(reference)
+            assert state == list(flatten(reference))
+
+
+def test_pca_model():
+    random.seed(3)
+    events = [[random.random(), random.random(), random.random()] for _ in range(50)]
+
+    pre = get_preprocessor("pca")([True, True, True])
+    pre.fit(events)
+    encoder = PCA().fit(events)
+    assert np.allclose(pre.transform(events[0]), encoder.transform(events[:1])[0])
+
+    # Models with the previous joblib dump of the sklearn PCA
+    dump = io.BytesIO()
+    joblib.dump(encoder, dump, compress=3)
+    legacy = {"features": [True, True, True], "model": list(dump.getvalue())}
+
+    for model in [pre.get_fitted_model(), legacy]:
+        restored = get_preprocessor("pca").from_fitted_model(model)
+        assert np.allclose(restored.transform(events[1]), pre.transform(events[1]))
+        assert restored.output_widths([None] * 3) == [None] * 3
+
+
+@pytest.mark.parametrize("window_size", [1, 3])
+def test_gradient(window_size):
+    random.seed(4)
+    events = [[random.random(), "a", random.random()] for _ in range(100)]
+    timestamps = np.cumsum([random.random() for _ in range(100)]).tolist()
+
+    pre = get_preprocessor("gradient")([True, False, True], window_size=window_size)
+    timed = get_preprocessor("gradient")(
+        [True, False, True], window_size=window_size, timestamp=True
+    )
+
+    for k, event in enumerate(events):
+        gradient = pre.transform(copy.deepcopy(event))
+        per_time = timed.transform(copy.deepcopy(event), timestamps[k])
+        assert gradient[1] == per_time[1] == "a"
+
+        if k < window_size:
+            assert gradient == per_time == [None, "a", None]
+            continue
+
+        # Mean of the differences between consecutive values within the window
+        for i in [0, 2]:
+            window = [e[i] for e in events[k - window_size : k + 1]]
+            elapsed = timestamps[k] - timestamps[k - window_size]
+            assert np.isclose(gradient[i], np.mean(np.diff(window)))
+            assert np.isclose(per_time[i], np.sum(np.diff(window)) / elapsed)
+
+    pre.reset()
+    assert pre.transform(copy.deepcopy(events[0])) == [None, "a", None]
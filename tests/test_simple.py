@@ -0,0 +1,74 @@
+import numpy as np
+import random
+
+import ipal_iids.settings as settings
+from ids.featureids import FeatureIDS
+from ids.simple.histogram import Histogram, SlidingHistogram
+from ids.simple.minmax import MinMax
+from ids.simple.steadytime import SteadyTime
+
+
+def test_window_counts():
+    random.seed(0)
+    column = [random.choice([0.0, 1.0, 2.0]) for _ in range(300)]
+    vals = [0.0, 1.0, 2.0]
+
+    settings.idss = {"H": {"_type": "Histogram", "window_size": 17}}
+    counts = Histogram(name="H")._window_counts(column, vals)
+
+    for t in range(len(column) - 17 + 1):
+        window = column[t : t + 17]
+        assert [int(c) for c in counts[:, t]] == [window.count(v) for v in vals]
+
+
+def test_sliding_histogram():
+    random.seed(1)
+    lower, upper = [2, 0, 1], [5, 3, 4]
+    hist = SlidingHistogram(7, lower, upper)
+
+    values = []
+    for _ in range(200):
+        code = random.choice([0, 0, 1, 2])
+        values.append(code)
+        complete = hist.push(code)
+
+        window = values[-7:]
+        assert complete == (len(values) >= 7)
+        assert hist.is_valid() == all(
+            lower[c] <= window.count(c) <= upper[c] for c in range(3)
+        )
+
+
+def test_block_lengths():
+    random.seed(2)
+    column = [random.choice([0.0, 0.0, 1.0, 2.0]) for _ in range(300)]
+
+    settings.idss = {"ST": {"_type": "Steadytime"}}
+    ids = SteadyTime(name="ST")
+    blocks, lengths = ids._block_lengths(column, [0.0, 1.0, 2.0])
+
+    # Reference by replaying the live update
+    expected = []
+    for value in column:
+        complete, val, t = ids._update(0, value)
+        if complete:
+            expected.append(([0.0, 1.0, 2.0].index(val), t))
+
+    assert list(zip(blocks.tolist(), lengths.tolist())) == expected
+
+
+def test_minmax_array(monkeypatch):
+    random.seed(3)
+    events = [[random.random(), float(random.randint(0, 3))] for _ in range(100)]
+
+    models = []
+    for data in [events, np.array(events)]:
+        monkeypatch.setattr(
+            FeatureIDS, "train", lambda self, state=None: (data, [False] * 100, None)
+        )
+        settings.idss = {"MM": {"_type": "MinMax"}}
+        ids = MinMax(name="MM")
+        ids.train(state="-")
+        models.append((ids.mins, ids.maxs, ids.deltas))
+
+    assert models[0] == models[1]
@@ -0,0 +1,44 @@
+import sys
+import time
+
+import pytest
+
+from subprocess import Popen, PIPE
+
+from .conftest import metaids
+
+# IDSs that do not depend on any heavy library
+LIGHTWEIGHT_IDSNAMES = ["Dummy", "Optimal", "MinMax", "Histogram", "Steadytime"]
+HEAVY_MODULES = ["tensorflow", "torch", "sklearn", "gurobipy", "joblib"]
+MAX_STARTUP_TIME = 1.0  # in seconds
+
+
+@pytest.mark.parametrize("idsname", LIGHTWEIGHT_IDSNAMES)
+def test_startup_time(idsname):
+    start = time.time()
+    errno, stdout, stderr = metaids(["--default.config", idsname])
+    duration = time.time() - start
+
+    assert errno == 0
+    assert duration < MAX_STARTUP_TIME, "Startup took {:.2f}s".format(duration)
+
+
+@pytest.mark.parametrize("idsname", LIGHTWEIGHT_IDSNAMES)
+def test_startup_imports(idsname):
+    code = "; ".join(
+        [
+            "import sys",
+            "from ipal_iids import iids",
+            "from ids.utils import get_ids",
+            "from combiner.utils import get_combiner",
+            "get_ids('{}')".format(idsname),
+            "get_combiner('Or')",
+            "print(','.join(m for m in {} if m in sys.modules))".format(HEAVY_MODULES),
+        ]
+    )
+
+    p = Popen([sys.executable, "-c", code], stdout=PIPE, stderr=PIPE)
+    stdout, stderr = p.communicate()
+
+    assert p.returncode == 0, stderr.decode()
+    assert stdout.decode().strip() == ""